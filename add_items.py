@@ -1,31 +1,27 @@
-import os
+import concurrent.futures
+import queue
 import sqlite3
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-
-# Additional imports for webcam barcode scanning
-import cv2
-from pyzbar import pyzbar
-
-# Path to your SQLite database
-db_dir = os.path.join(os.path.dirname(__file__), 'db')
-DB_PATH = os.path.join(db_dir, 'pos.db')
-
-def ensure_db():
-    """Create the items table if it doesn't exist."""
-    os.makedirs(db_dir, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS items (
-            barcode   TEXT PRIMARY KEY,
-            name      TEXT NOT NULL,
-            price     REAL NOT NULL,
-            quantity  INTEGER NOT NULL
-        )
-    """)
-    conn.commit()
-    conn.close()
+from tkinter import ttk, messagebox, simpledialog, filedialog
+
+from barcode_scanner import BarcodeScanner
+from catalog_import import format_summary, import_catalog, upsert_items
+from catalog_index import get_catalog
+from database import BILLING_DB, close_thread_connections
+from journal import WRITE_TIMEOUT, get_writer
+
+# Items live in the same database the POS sells from (see migrations.py)
+DB_PATH = BILLING_DB
+IMPORT_POLL_MS = 200  # how often the import progress label is refreshed
+
+
+def add_item(cursor, barcode, name, price, qty):
+    """Upsert one item, journal the added stock, and return its previous quantity (None if new)"""
+    cursor.execute("SELECT quantity FROM items WHERE barcode = ?", (barcode,))
+    row = cursor.fetchone()
+    upsert_items(cursor, [(barcode, name, price, qty)])
+    return row[0] if row else None
 
 class AddItems:
     def __init__(self, window):
@@ -34,10 +30,11 @@ class AddItems:
         """
         self.window = window
         self.window.title("Add / Restock Item")
-        self.window.geometry("400x300")
+        self.window.geometry("460x340")
         self.window.resizable(False, False)
 
-        ensure_db()
+        self.import_thread = None
+        self.import_status = tk.StringVar()
         self._build_ui()
 
     def _build_ui(self):
@@ -72,39 +69,25 @@ class AddItems:
         btns.grid(row=4, column=0, columnspan=3, pady=20)
         ttk.Button(btns, text="Add / Restock", command=self.add_or_restock).pack(side=tk.LEFT, padx=5)
         ttk.Button(btns, text="Clear", command=self.clear_fields).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btns, text="Import Catalog…", command=self.import_catalog).pack(side=tk.LEFT, padx=5)
         ttk.Button(btns, text="Close", command=self.window.destroy).pack(side=tk.LEFT, padx=5)
+        ttk.Label(frm, textvariable=self.import_status).grid(row=5, column=0, columnspan=3)
 
     def scan_barcode(self):
         """Open webcam and scan for barcodes."""
-        cap = cv2.VideoCapture(0)
-        barcode_data = None
         messagebox.showinfo("Info", "Press 'q' to quit scanning.", parent=self.window)
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            barcodes = pyzbar.decode(frame)
-            for barcode in barcodes:
-                barcode_data = barcode.data.decode('utf-8')
-                (x, y, w, h) = barcode.rect
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(frame, barcode_data, (x, y - 10), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                break
-
-            cv2.imshow('Scan Barcode - Press q to quit', frame)
-            if barcode_data or cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-
-        cap.release()
-        cv2.destroyAllWindows()
-
-        if barcode_data:
-            self.entry_barcode.delete(0, tk.END)
-            self.entry_barcode.insert(0, barcode_data)
+        self.scanner = BarcodeScanner(lambda code: None, on_finish=self.on_scan_finished,
+                                      window_title='Scan Barcode - Press q to quit')
+        self.scanner.start()
+
+    def on_scan_finished(self, codes):
+        """Scanner finished: fill in the barcode field."""
+        if codes:
+            self.window.after(0, self.entry_barcode.delete, 0, tk.END)
+            self.window.after(0, self.entry_barcode.insert, 0, codes[0])
         else:
-            messagebox.showwarning("Warning", "No barcode detected.", parent=self.window)
+            self.window.after(0, lambda: messagebox.showwarning(
+                "Warning", "No barcode detected.", parent=self.window))
 
     def clear_fields(self):
         """Clear all entries."""
@@ -131,27 +114,68 @@ class AddItems:
             messagebox.showerror("Error", "Price and Quantity must be ≥ 0.", parent=self.window)
             return
 
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
         try:
-            c.execute("""
-                INSERT INTO items (barcode, name, price, quantity)
-                VALUES (?, ?, ?, ?)
-            """, (bc, name, price_f, qty_i))
-            conn.commit()
-            messagebox.showinfo("Added", f"Item '{name}' added with {qty_i} units.", parent=self.window)
-        except sqlite3.IntegrityError:
-            c.execute("SELECT quantity FROM items WHERE barcode = ?", (bc,))
-            old_qty = c.fetchone()[0]
-            new_qty = old_qty + qty_i
-            c.execute("""
-                UPDATE items
-                   SET name=?, price=?, quantity=?
-                 WHERE barcode=?
-            """, (name, price_f, new_qty, bc))
-            conn.commit()
-            messagebox.showinfo("Restocked",
-                f"'{name}' existed: quantity {old_qty} → {new_qty} units.", parent=self.window)
-        finally:
-            conn.close()
-            self.clear_fields()
+            old_qty = get_writer(DB_PATH).submit(add_item, bc, name, price_f, qty_i).result(WRITE_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            messagebox.showerror("Database Error",
+                                 f"The database did not answer within {WRITE_TIMEOUT} s; the item may "
+                                 "still be saved. Check it before saving again.", parent=self.window)
+            return
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            # Keep the fields so the entry can be retried
+            messagebox.showerror("Database Error", f"Failed to save item: {e}", parent=self.window)
+            return
+        if old_qty is None:
+            title, message = "Added", f"Item '{name}' added with {qty_i} units."
+        else:
+            title, message = "Restocked", f"'{name}' existed: quantity {old_qty} → {old_qty + qty_i} units."
+        messagebox.showinfo(title, message, parent=self.window)
+        self.clear_fields()
+        get_catalog(DB_PATH).refresh_barcode(bc)
+
+    def import_catalog(self):
+        """Bulk import a CSV/XLSX catalog on a worker thread"""
+        if self.import_thread and self.import_thread.is_alive():
+            return
+        path = filedialog.askopenfilename(
+            parent=self.window, title="Import Catalog",
+            filetypes=[("Catalog files", "*.csv *.xlsx"), ("All files", "*.*")])
+        if not path:
+            return
+
+        results = queue.Queue()
+
+        def worker():
+            try:
+                result = import_catalog(path, DB_PATH,
+                                        progress=lambda n: results.put(("progress", n)))
+                # Reload the whole index once rather than row by row
+                get_catalog(DB_PATH).load()
+                results.put(("done", result))
+            except Exception as e:
+                results.put(("error", e))
+            finally:
+                close_thread_connections()
+
+        def poll():
+            while True:
+                try:
+                    kind, value = results.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    self.import_status.set(f"Importing… {value} rows read")
+                    continue
+                if kind == "done":
+                    self.import_status.set(f"Imported {value['imported']} items")
+                    messagebox.showinfo("Import Complete", format_summary(value), parent=self.window)
+                else:
+                    self.import_status.set("Import failed")
+                    messagebox.showerror("Import Failed", str(value), parent=self.window)
+                return
+            self.window.after(IMPORT_POLL_MS, poll)
+
+        self.import_status.set("Importing…")
+        self.import_thread = threading.Thread(target=worker, daemon=True)
+        self.import_thread.start()
+        self.window.after(IMPORT_POLL_MS, poll)
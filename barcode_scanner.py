@@ -1,29 +1,196 @@
-import cv2
-from pyzbar.pyzbar import decode
+import threading
+import time
 
-def scan_and_add_loop(add_callback):
-    cap = cv2.VideoCapture(0)
-    last_code = ""
+# cv2 and pyzbar are imported where they are used, so screens that merely
+# offer scanning open without loading them
+
+MAX_DECODE_WIDTH = 640   # frames are downscaled to this width before decoding
+CODE_COOLDOWN = 1.5      # seconds a code must be out of view before it counts again
+WINDOW_TITLE = "Barcode Scanner (Press Q to stop)"
+
+
+def preprocess(frame, max_width=MAX_DECODE_WIDTH, roi=None, grayscale=True):
+    """Grayscale, crop and downscale a frame for decoding.
+
+    roi is (x, y, w, h) as fractions of the frame. Returns the image plus the
+    (scale, x offset, y offset) needed to map decoded rects back.
+    """
+    import cv2
+
+    if grayscale and frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    x0 = y0 = 0
+    if roi:
+        h, w = frame.shape[:2]
+        x0, y0 = int(roi[0] * w), int(roi[1] * h)
+        frame = frame[y0:y0 + int(roi[3] * h), x0:x0 + int(roi[2] * w)]
+    scale = 1.0
+    if max_width and frame.shape[1] > max_width:
+        scale = max_width / frame.shape[1]
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return frame, (scale, x0, y0)
+
+
+def decode_frame(frame, max_width=MAX_DECODE_WIDTH, roi=None, grayscale=True):
+    """Decode barcodes in a BGR or gray frame as [(code, (x, y, w, h)), ...]"""
+    from pyzbar.pyzbar import decode
+
+    image, (scale, x0, y0) = preprocess(frame, max_width, roi, grayscale)
+    results = []
+    for barcode in decode(image):
+        x, y, w, h = barcode.rect
+        rect = (int(x / scale) + x0, int(y / scale) + y0, int(w / scale), int(h / scale))
+        results.append((barcode.data.decode("utf-8"), rect))
+    return results
+
+
+class CodeCooldown:
+    """Suppresses a code until it has been out of view for cooldown seconds"""
+
+    def __init__(self, cooldown=CODE_COOLDOWN):
+        self.cooldown = cooldown
+        self.last_seen = {}   # code -> time it was last in view
+
+    def accept(self, code, now):
+        last_seen = self.last_seen.get(code)
+        self.last_seen[code] = now
+        return last_seen is None or now - last_seen >= self.cooldown
 
-    print("📷 Auto-scanning... Press Q to quit.")
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
 
-        barcodes = decode(frame)
-        for barcode in barcodes:
-            code = barcode.data.decode("utf-8")
+class BarcodeScanner:
+    """Webcam barcode scanning shared by every screen.
 
-            if code != last_code:
-                print(f"✅ Scanned: {code}")
-                last_code = code
-                add_callback(code)
+    A capture thread reads frames and shows the preview. A decode worker
+    takes the newest frame, so frames arriving while a decode is running
+    are dropped instead of queueing up. It decodes a grayscale, downscaled
+    (optionally cropped) copy. on_code(code) is called on the decode thread
+    for each code read. In single-shot mode scanning stops after the first
+    code unless on_code returns False. In continuous mode a code is only
+    reported again once it has been out of view for cooldown seconds, so an
+    item held under the camera counts once. on_finish(codes) is called once
+    scanning stops, with every code that was accepted.
+    """
 
-        cv2.imshow("Auto Scanner (Press Q to stop)", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    def __init__(self, on_code, on_finish=None, source=0, continuous=False,
+                 max_width=MAX_DECODE_WIDTH, roi=None, show_preview=True,
+                 window_title=WINDOW_TITLE, cooldown=CODE_COOLDOWN):
+        self.on_code = on_code
+        self.on_finish = on_finish
+        self.source = source
+        self.continuous = continuous
+        self.max_width = max_width
+        self.roi = roi
+        self.show_preview = show_preview
+        self.window_title = window_title
+        self.cooldown = CodeCooldown(cooldown)
 
-    cap.release()
-    cv2.destroyAllWindows()
+        self.active = False
+        self.codes = []
+        self.frame = None
+        self.frame_id = 0
+        self.last_rects = []
+        self.frames_captured = 0
+        self.frames_decoded = 0
+        self.decode_seconds = 0.0
+        self.condition = threading.Condition()
+        self.threads = []
 
+    @property
+    def frames_dropped(self):
+        return self.frames_captured - self.frames_decoded
+
+    def start(self):
+        if self.active:
+            return
+        self.active = True
+        self.threads = [
+            threading.Thread(target=self.capture_loop, daemon=True),
+            threading.Thread(target=self.decode_loop, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.active = False
+            self.condition.notify_all()
+
+    def wait(self):
+        for thread in self.threads:
+            thread.join()
+
+    def capture_loop(self):
+        import cv2
+
+        cap = cv2.VideoCapture(self.source)
+        try:
+            while self.active:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                with self.condition:
+                    self.frame = frame
+                    self.frame_id += 1
+                    self.frames_captured += 1
+                    self.condition.notify_all()
+
+                if self.show_preview:
+                    # Draw on a copy; the decode worker may be reading frame
+                    preview = frame.copy() if self.last_rects else frame
+                    for x, y, w, h in self.last_rects:
+                        cv2.rectangle(preview, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                    cv2.imshow(self.window_title, preview)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+        finally:
+            cap.release()
+            if self.show_preview:
+                cv2.destroyWindow(self.window_title)
+                cv2.waitKey(1)
+            self.stop()
+
+    def decode_loop(self):
+        seen_id = 0
+        try:
+            while True:
+                with self.condition:
+                    while self.active and self.frame_id == seen_id:
+                        self.condition.wait()
+                    if not self.active:
+                        break
+                    frame, seen_id = self.frame, self.frame_id
+
+                start = time.perf_counter()
+                results = decode_frame(frame, self.max_width, self.roi)
+                self.decode_seconds += time.perf_counter() - start
+                self.frames_decoded += 1
+                self.last_rects = [rect for _code, rect in results]
+
+                now = time.monotonic()
+                for code, _rect in results:
+                    if not self.active:
+                        break
+                    if self.continuous and not self.cooldown.accept(code, now):
+                        continue
+                    accepted = self.on_code(code) is not False
+                    if accepted:
+                        self.codes.append(code)
+                        if not self.continuous:
+                            self.stop()
+        finally:
+            self.stop()
+            if self.on_finish:
+                self.on_finish(list(self.codes))
+
+
+def scan_and_add_loop(add_callback):
+    """Scan continuously, passing each new code to add_callback, until Q is pressed"""
+    def on_code(code):
+        print(f"✅ Scanned: {code}")
+        add_callback(code)
+
+    print("📷 Auto-scanning... Press Q to quit.")
+    scanner = BarcodeScanner(on_code, continuous=True,
+                             window_title="Auto Scanner (Press Q to stop)")
+    scanner.start()
+    scanner.wait()
@@ -0,0 +1,196 @@
+import argparse
+import csv
+import os
+import time
+
+from database import BILLING_DB, close_thread_connections, transaction
+from journal import append
+
+CHUNK_SIZE = 10000  # rows validated and upserted per transaction
+COLUMNS = ["barcode", "name", "price", "quantity"]
+QUANTITY_LIMIT = 2 ** 63  # items.quantity is a signed 64-bit SQLite integer
+
+UPSERT_SQL = """
+    INSERT INTO items (barcode, name, price, quantity) VALUES (?, ?, ?, ?)
+    ON CONFLICT (barcode) DO UPDATE SET
+        name = excluded.name,
+        price = excluded.price,
+        quantity = quantity + excluded.quantity
+"""
+REPLACE_QUANTITY_SQL = UPSERT_SQL.replace(
+    "quantity = quantity + excluded.quantity", "quantity = excluded.quantity")
+
+
+def upsert_items(cursor, rows, replace_quantity=False, ref=None):
+    """Insert or update (barcode, name, price, quantity) rows by barcode.
+
+    Existing items take the new name and price; their quantity is
+    increased by the given amount (restock), or replaced with
+    replace_quantity. Every stock change is journaled: added stock as a
+    Purchase, a replaced quantity as an Adjustment of the difference.
+    """
+    if not replace_quantity:
+        cursor.executemany(UPSERT_SQL, rows)
+        append(cursor, "Purchase", [(barcode, qty, None) for barcode, _name, _price, qty in rows if qty],
+               ref, by="barcode")
+        return
+
+    # Deltas against the stock before this call; a barcode repeated in
+    # rows is measured against its previous row
+    current, deltas = {}, []
+    for barcode, _name, _price, qty in rows:
+        if barcode not in current:
+            row = cursor.execute("SELECT quantity FROM items WHERE barcode = ?", (barcode,)).fetchone()
+            current[barcode] = row[0] if row else 0
+        if qty != current[barcode]:
+            deltas.append((barcode, qty - current[barcode], None))
+        current[barcode] = qty
+    cursor.executemany(REPLACE_QUANTITY_SQL, rows)
+    append(cursor, "Adjustment", deltas, ref, by="barcode")
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yield DataFrames of string cells from a CSV or XLSX file, chunk_size rows each.
+
+    Headers are matched case-insensitively. Each frame keeps the source
+    row number (header = row 1) in its index.
+    """
+    import pandas as pd
+
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell or "").strip().lower() for cell in next(rows, ())]
+            chunk, first_row = [], 2
+            for row in rows:
+                chunk.append(["" if cell is None else str(cell) for cell in row])
+                if len(chunk) == chunk_size:
+                    yield pd.DataFrame(chunk, columns=header,
+                                       index=range(first_row, first_row + len(chunk)))
+                    first_row += len(chunk)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header,
+                                   index=range(first_row, first_row + len(chunk)))
+        finally:
+            workbook.close()
+        return
+
+    for frame in pd.read_csv(path, dtype=str, keep_default_na=False,
+                             chunksize=chunk_size, skipinitialspace=True):
+        frame.columns = [str(c).strip().lower() for c in frame.columns]
+        frame.index = frame.index + 2
+        yield frame
+
+
+def validate(frame):
+    """Split a chunk into (valid rows as tuples, rejected [(row, reason), ...])"""
+    import pandas as pd
+
+    missing = [c for c in COLUMNS if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    barcode = frame["barcode"].str.strip()
+    name = frame["name"].str.strip()
+    price = pd.to_numeric(frame["price"].str.strip(), errors="coerce")
+    quantity = pd.to_numeric(frame["quantity"].str.strip(), errors="coerce")
+
+    infinite = [float("inf"), float("-inf")]
+
+    # Checked in order; a row is reported with its first failing reason
+    checks = [
+        (barcode == "", "missing barcode"),
+        (name == "", "missing name"),
+        (price.isna(), "price is not a number"),
+        (price.isin(infinite), "price is not finite"),
+        (price < 0, "negative price"),
+        (quantity.isna() | quantity.isin(infinite) | (quantity % 1 != 0),
+         "quantity is not a whole number"),
+        (quantity < 0, "negative quantity"),
+        (quantity >= QUANTITY_LIMIT, "quantity is too large"),
+    ]
+    reason = pd.Series("", index=frame.index)
+    for failed, message in checks:
+        reason = reason.mask((reason == "") & failed, message)
+    bad = reason != ""
+
+    good = ~bad
+    valid = list(zip(barcode[good].tolist(), name[good].tolist(),
+                     price[good].astype(float).tolist(), quantity[good].astype("int64").tolist()))
+    rejected = list(zip(frame.index[bad], reason[bad]))
+    return valid, rejected
+
+
+def import_catalog(path, db_path=BILLING_DB, replace_quantity=False,
+                   rejects_path=None, progress=None, chunk_size=CHUNK_SIZE):
+    """Stream a supplier catalog into items and return a summary dict.
+
+    Each chunk is validated with vectorized pandas checks and upserted in
+    one transaction. Rejected rows (source row number and reason) are
+    written to rejects_path, by default <file>.rejected.csv, when there
+    are any. progress(rows_read) is called after each chunk.
+    """
+    if rejects_path is None:
+        rejects_path = os.path.splitext(path)[0] + ".rejected.csv"
+    start = time.perf_counter()
+    rows = imported = rejected = 0
+    rejects_file = rejects_writer = None
+    try:
+        for frame in read_chunks(path, chunk_size):
+            valid, bad = validate(frame)
+            with transaction(db_path) as cursor:
+                upsert_items(cursor, valid, replace_quantity, "Catalog import")
+            rows += len(frame)
+            imported += len(valid)
+            rejected += len(bad)
+            if bad:
+                if rejects_writer is None:
+                    rejects_file = open(rejects_path, "w", newline="", encoding="utf-8")
+                    rejects_writer = csv.writer(rejects_file)
+                    rejects_writer.writerow(["row", "reason"])
+                rejects_writer.writerows(bad)
+            if progress:
+                progress(rows)
+    finally:
+        if rejects_file:
+            rejects_file.close()
+        close_thread_connections()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'imported': imported,
+        'rejected': rejected,
+        'rejects_path': rejects_path if rejected else None,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else 0.0,
+    }
+
+
+def format_summary(result):
+    text = (f"{result['imported']} of {result['rows']} rows imported in "
+            f"{result['seconds']:.2f}s ({result['rows_per_sec']:.0f} rows/sec)")
+    if result['rejected']:
+        text += f"\n{result['rejected']} rows rejected, see {result['rejects_path']}"
+    return text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import a supplier catalog (CSV or XLSX)")
+    parser.add_argument("path", help="file with barcode, name, price and quantity columns")
+    parser.add_argument("--db", default=BILLING_DB)
+    parser.add_argument("--replace-quantity", action="store_true",
+                        help="set stock to the file's quantity instead of adding it")
+    parser.add_argument("--rejects", help="where to write rejected rows")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from migrations import ensure_schema
+    for _warning in ensure_schema(args.db):
+        print(f"Warning: {_warning}")
+    print(format_summary(import_catalog(args.path, args.db, args.replace_quantity,
+                                        args.rejects, chunk_size=args.chunk_size)))
@@ -0,0 +1,201 @@
+import bisect
+import threading
+
+from database import BILLING_DB, fetch_all
+
+DB_PATH = BILLING_DB
+
+
+class CatalogIndex:
+    """In-memory index of the items table.
+
+    Exact barcode / id lookups are plain dict hits and name searches use a
+    sorted list of (token, item_id) pairs, so a prefix query is a bisect
+    instead of a LIKE scan. Rows are stored as (id, name, price) tuples,
+    the same shape the POS already works with.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.by_id = {}
+        self.by_barcode = {}
+        self.barcodes = {}   # item_id -> barcode, needed to unlink on change
+        self.tokens = []     # sorted [(token, item_id), ...]
+
+    @staticmethod
+    def tokenize(name):
+        return sorted(set((name or "").lower().split()))
+
+    def load(self):
+        """(Re)build the whole index from the database"""
+        rows = fetch_all("SELECT id, barcode, name, price FROM items", db_path=self.db_path)
+
+        by_id, by_barcode, barcodes, tokens = {}, {}, {}, []
+        for item_id, barcode, name, price in rows:
+            by_id[item_id] = (item_id, name, price)
+            if barcode:
+                by_barcode[barcode] = item_id
+                barcodes[item_id] = barcode
+            tokens.extend((tok, item_id) for tok in self.tokenize(name))
+        tokens.sort()
+
+        with self.lock:
+            self.by_id, self.by_barcode = by_id, by_barcode
+            self.barcodes, self.tokens = barcodes, tokens
+            self.loaded = True
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    # --- Keeping the index in sync with writers ---
+
+    def _unlink(self, item_id):
+        old = self.by_id.pop(item_id, None)
+        if old is None:
+            return
+        barcode = self.barcodes.pop(item_id, None)
+        if barcode is not None and self.by_barcode.get(barcode) == item_id:
+            del self.by_barcode[barcode]
+        for tok in self.tokenize(old[1]):
+            pos = bisect.bisect_left(self.tokens, (tok, item_id))
+            if pos < len(self.tokens) and self.tokens[pos] == (tok, item_id):
+                del self.tokens[pos]
+
+    def upsert(self, item_id, barcode, name, price):
+        """Insert or replace a single item"""
+        with self.lock:
+            self._unlink(item_id)
+            self.by_id[item_id] = (item_id, name, price)
+            if barcode:
+                self.by_barcode[barcode] = item_id
+                self.barcodes[item_id] = barcode
+            for tok in self.tokenize(name):
+                bisect.insort(self.tokens, (tok, item_id))
+
+    def remove(self, item_id):
+        """Drop an item from the index"""
+        with self.lock:
+            self._unlink(int(item_id))
+
+    def _refresh(self, where, value):
+        rows = fetch_all(
+            f"SELECT id, barcode, name, price FROM items WHERE {where} = ?", (value,),
+            db_path=self.db_path
+        )
+        for row in rows:
+            self.upsert(*row)
+        return rows
+
+    def refresh_id(self, item_id):
+        """Re-read one item by id after a write; drops it if it is gone"""
+        if not self.loaded:
+            return
+        if not self._refresh("id", int(item_id)):
+            self.remove(item_id)
+
+    def refresh_barcode(self, barcode):
+        """Re-read one item by barcode after a write"""
+        if not self.loaded:
+            return
+        self._refresh("barcode", barcode)
+
+    # --- Queries ---
+
+    def _prefix_range(self, prefix):
+        lo = bisect.bisect_left(self.tokens, (prefix,))
+        hi = bisect.bisect_left(self.tokens, (prefix + "\uffff",))
+        return lo, hi
+
+    @staticmethod
+    def as_id(term):
+        """term as an item id, or None if it cannot be one"""
+        if term.isdecimal() and len(term) <= 19:
+            item_id = int(term)
+            if item_id < 2 ** 63:
+                return item_id
+        return None
+
+    def exact(self, term):
+        """Item with barcode or id term, or None.
+
+        A miss is checked against the database, since another till or
+        process (or a catalog import) may have added the item since the
+        index was loaded; a row found there is added to the index.
+        """
+        item_id = self.as_id(term)
+        with self.lock:
+            hit = self.by_barcode.get(term)
+            if hit is None and item_id in self.by_id:
+                hit = item_id
+            if hit is not None:
+                return self.by_id[hit]
+        rows = self._refresh("barcode", term)
+        if not rows and item_id is not None:
+            rows = self._refresh("id", item_id)
+        return (rows[0][0], rows[0][2], rows[0][3]) if rows else None
+
+    def lookup(self, term):
+        """Exact barcode, then exact id, then first name-prefix match"""
+        self.ensure_loaded()
+        term = term.strip()
+        item = self.exact(term)
+        if item is not None:
+            return item
+        matches = self.search(term, limit=1, exact=False)
+        return matches[0] if matches else None
+
+    def search(self, term, limit=50, exact=True):
+        """Items whose name has a word starting with every word of term.
+
+        Barcode and id hits come first (unless exact is False); results
+        are (id, name, price).
+        """
+        self.ensure_loaded()
+        term = term.strip()
+        words = self.tokenize(term)
+        if not words:
+            return []
+
+        results = []
+        hit = self.exact(term) if exact else None
+        if hit is not None:
+            results.append(hit)
+        with self.lock:
+
+            # Walk the narrowest prefix range and check the other words against
+            # each candidate's own tokens, stopping as soon as limit is reached
+            ranges = {word: self._prefix_range(word) for word in words}
+            driver = min(words, key=lambda w: ranges[w][1] - ranges[w][0])
+            others = [w for w in words if w != driver]
+            seen = {hit[0] if hit else None}
+            lo, hi = ranges[driver]
+            for pos in range(lo, hi):
+                if len(results) >= limit:
+                    break
+                item_id = self.tokens[pos][1]
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                item = self.by_id[item_id]
+                if others:
+                    name_tokens = self.tokenize(item[1])
+                    if not all(any(t.startswith(w) for t in name_tokens) for w in others):
+                        continue
+                results.append(item)
+        return results
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(db_path=DB_PATH):
+    """Process-wide CatalogIndex for a database file"""
+    with _catalogs_lock:
+        catalog = _catalogs.get(db_path)
+        if catalog is None:
+            catalog = _catalogs[db_path] = CatalogIndex(db_path)
+        return catalog
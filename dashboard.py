@@ -0,0 +1,89 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+import sqlite3
+from datetime import date, timedelta
+from database import BILLING_DB
+from migrations import ensure_schema
+from sales_summary import daily, day_totals, hourly, month_to_date, top_items
+
+TREND_DAYS = 14  # days shown in the daily trend table
+
+
+class SalesDashboard:
+    """Today, month-to-date and trend figures read from the summary tables"""
+
+    def __init__(self, window):
+        self.window = window
+        self.window.title("Sales Dashboard")
+        self.window.geometry("900x650")
+        self.window.configure(bg="#f5f5f5")
+
+        self.today_var = tk.StringVar()
+        self.month_var = tk.StringVar()
+        self.create_widgets()
+        self.refresh()
+
+    def create_widgets(self):
+        main = ttk.Frame(self.window)
+        main.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+
+        header = ttk.Frame(main)
+        header.pack(fill=tk.X, pady=(0, 10))
+        ttk.Label(header, text="Sales Dashboard", font=("Arial", 16, "bold")).pack(side=tk.LEFT)
+        ttk.Button(header, text="Refresh", command=self.refresh).pack(side=tk.RIGHT)
+
+        totals = ttk.Frame(main)
+        totals.pack(fill=tk.X, pady=(0, 10))
+        ttk.Label(totals, textvariable=self.today_var, font=("Arial", 12)).pack(anchor=tk.W)
+        ttk.Label(totals, textvariable=self.month_var, font=("Arial", 12)).pack(anchor=tk.W)
+
+        tables = ttk.Frame(main)
+        tables.pack(fill=tk.BOTH, expand=True)
+        self.hourly_tree = self.make_table(tables, "Today by Hour", ("Hour", "Sales", "Revenue"), 0)
+        self.top_tree = self.make_table(tables, "Top Items This Month", ("Item", "Qty", "Revenue"), 1)
+        self.daily_tree = self.make_table(tables, f"Last {TREND_DAYS} Days",
+                                          ("Day", "Sales", "Items", "Revenue"), 2)
+        for column in range(3):
+            tables.columnconfigure(column, weight=1)
+        tables.rowconfigure(0, weight=1)
+
+    def make_table(self, parent, title, cols, column):
+        frame = ttk.LabelFrame(parent, text=title)
+        frame.grid(row=0, column=column, sticky="nsew", padx=5)
+        tree = ttk.Treeview(frame, columns=cols, show="headings")
+        for col in cols:
+            tree.heading(col, text=col)
+            tree.column(col, width=90, anchor=tk.CENTER)
+        tree.pack(fill=tk.BOTH, expand=True)
+        return tree
+
+    def refresh(self):
+        today = date.today().isoformat()
+        try:
+            count, items, revenue = day_totals(today)
+            self.today_var.set(f"Today: {count} sales, {items} items, ₹{revenue:.2f}")
+            count, items, revenue = month_to_date(today)
+            self.month_var.set(f"Month to date: {count} sales, {items} items, ₹{revenue:.2f}")
+
+            self.fill(self.hourly_tree, [(f"{hour:02d}:00", n, f"₹{rev:.2f}")
+                                         for hour, n, rev in hourly(today)])
+            self.fill(self.top_tree, [(name, qty, f"₹{rev:.2f}")
+                                      for name, qty, rev in top_items(today[:8] + "01", today)])
+            start = (date.today() - timedelta(days=TREND_DAYS - 1)).isoformat()
+            self.fill(self.daily_tree, [(day, n, qty, f"₹{rev:.2f}")
+                                        for day, n, qty, rev in reversed(daily(start, today))])
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Error: {e}")
+
+    def fill(self, tree, rows):
+        tree.delete(*tree.get_children())
+        for row in rows:
+            tree.insert("", "end", values=row)
+
+
+if __name__ == "__main__":
+    ensure_schema(BILLING_DB)
+
+    root = tk.Tk()
+    app = SalesDashboard(root)
+    root.mainloop()
@@ -0,0 +1,126 @@
+import contextlib
+import os
+import sqlite3
+import threading
+
+BILLING_DB = "db/billing.db"
+POS_DB = "db/pos.db"
+
+BUSY_TIMEOUT_MS = 5000      # wait this long on a locked database before failing
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+
+_local = threading.local()
+
+
+def get_connection(db_path=BILLING_DB):
+    """Long-lived connection to db_path owned by the calling thread.
+
+    sqlite3 connections must stay on the thread that created them, so each
+    thread gets its own connection per database file, opened on first use and
+    reused afterwards. The connection runs in autocommit mode; group writes
+    with transaction(). Reusing the connection also reuses its cache of
+    prepared statements, keyed by SQL text.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = sqlite3.connect(
+            db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        connections[db_path] = conn
+    return conn
+
+
+def close_thread_connections():
+    """Close every connection owned by the calling thread"""
+    connections = getattr(_local, "connections", None) or {}
+    while connections:
+        _path, conn = connections.popitem()
+        conn.close()
+
+
+@contextlib.contextmanager
+def transaction(db_path=BILLING_DB):
+    """Run a block of writes as one transaction and yield a cursor.
+
+    The write lock is taken up front (BEGIN IMMEDIATE) so concurrent writers
+    wait on the busy timeout instead of failing half way through. Nested use
+    on the same thread becomes a savepoint. Commits on success, rolls back
+    and re-raises on error, including a failed COMMIT, so the thread's
+    connection is never left inside a transaction.
+    """
+    conn = get_connection(db_path)
+    cursor = conn.cursor()
+    if conn.in_transaction:
+        cursor.execute("SAVEPOINT nested")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute("ROLLBACK TO nested")
+            cursor.execute("RELEASE nested")
+            raise
+        cursor.execute("RELEASE nested")
+        return
+
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        yield cursor
+        cursor.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+
+
+def fetch_one(sql, params=(), db_path=BILLING_DB):
+    return get_connection(db_path).execute(sql, params).fetchone()
+
+
+def fetch_all(sql, params=(), db_path=BILLING_DB):
+    return get_connection(db_path).execute(sql, params).fetchall()
+
+
+def execute(sql, params=(), db_path=BILLING_DB):
+    """Run a single write statement (autocommitted) and return its cursor"""
+    return get_connection(db_path).execute(sql, params)
+
+
+def ensure_timestamp_column(cursor, table, source="date"):
+    """Add and maintain a normalized, index-friendly ts column on table.
+
+    source holds free-form text timestamps; ts stores them as
+    'YYYY-MM-DD HH:MM:SS' (left as-is when SQLite cannot parse them), so
+    date ranges become plain comparisons such as ts >= '2025-05-01' that
+    an index on ts can serve. Existing rows are backfilled once, and
+    triggers fill ts for rows inserted or updated later.
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = [column[1] for column in cursor.fetchall()]
+    if "ts" not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN ts TEXT")
+        cursor.execute(f"UPDATE {table} SET ts = COALESCE(datetime({source}), {source})")
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ts_ai AFTER INSERT ON {table}
+        WHEN NEW.ts IS NULL BEGIN
+            UPDATE {table} SET ts = COALESCE(datetime(NEW.{source}), NEW.{source})
+            WHERE rowid = NEW.rowid;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ts_au AFTER UPDATE OF {source} ON {table}
+        BEGIN
+            UPDATE {table} SET ts = COALESCE(datetime(NEW.{source}), NEW.{source})
+            WHERE rowid = NEW.rowid;
+        END
+    """)
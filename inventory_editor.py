@@ -1,36 +1,190 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
+import concurrent.futures
+from catalog_index import get_catalog
+from database import BILLING_DB, fetch_all, fetch_one, get_connection
+from item_search import build_match, uses_trigram
+from journal import WRITE_TIMEOUT, append, get_writer, now
+from migrations import ensure_schema
+from sales import LOW_STOCK_THRESHOLD
+
+DB_PATH = BILLING_DB
+PAGE_SIZE = 100          # items shown per page
+FILTER_DEBOUNCE_MS = 250  # wait this long after a keystroke before re-querying
+CATALOG_RELOAD_AT = 500  # reload the whole search index after applying more edits than this
+
+COLUMNS = ("ID", "Barcode", "Name", "Price", "Qty")
+EDITABLE = {"Barcode": "barcode", "Name": "name", "Price": "price", "Qty": "quantity"}
+
+
+def parse_cell(column, text):
+    """Validate an edited value for an items column; raises ValueError"""
+    text = text.strip()
+    if column == "price":
+        value = float(text)
+        if value < 0:
+            raise ValueError("Price cannot be negative")
+        return value
+    if column == "quantity":
+        value = int(text)
+        if value < 0:
+            raise ValueError("Quantity cannot be negative")
+        return value
+    if not text:
+        raise ValueError("Name and Barcode cannot be empty")
+    return text
+
+
+def apply_item_edits(cursor, edits):
+    """Write buffered edits {item_id: (version, {column: value})} in the caller's transaction.
+
+    Each row is updated only if its version is still the one the edit was
+    made against; stock changes are journaled as Adjustments. Returns
+    (applied ids, conflicting ids); conflicting rows were changed or
+    deleted elsewhere and are left alone.
+    """
+    applied, conflicts = [], []
+    ts = now()
+    for item_id, (version, changes) in edits.items():
+        if "quantity" in changes:
+            row = cursor.execute("SELECT quantity FROM items WHERE id = ? AND version = ?",
+                                 (item_id, version)).fetchone()
+            if row and row[0] != changes["quantity"]:
+                append(cursor, "Adjustment", [(item_id, changes["quantity"] - row[0], None)],
+                       "Inventory Editor", ts)
+        sets = ", ".join(f"{column} = ?" for column in changes)
+        cursor.execute(f"UPDATE items SET {sets} WHERE id = ? AND version = ?",
+                       [*changes.values(), item_id, version])
+        (applied if cursor.rowcount else conflicts).append(item_id)
+    return applied, conflicts
+
+
+def remove_item(cursor, item_id):
+    """Delete an item, journaling any stock it still held as a negative Adjustment.
+
+    Returns False if the item was already gone.
+    """
+    row = cursor.execute("SELECT quantity FROM items WHERE id = ?", (item_id,)).fetchone()
+    if row is None:
+        return False
+    if row[0]:
+        append(cursor, "Adjustment", [(item_id, -row[0], None)], "Deleted in Inventory Editor")
+    cursor.execute("DELETE FROM items WHERE id = ?", (item_id,))
+    return True
+
+
+def item_filters(term="", low_stock=False, zero_price=False, trigram=True):
+    """WHERE conditions and parameters for the inventory filter box"""
+    conds, params = [], []
+    term = term.strip()
+    if term:
+        match = build_match(term, trigram)
+        if match:
+            # Exact barcode, or name via the items_fts index
+            conds.append("(barcode = ? OR id IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?))")
+            params.extend([term, match])
+        else:
+            # Too short for the trigram index
+            conds.append("(barcode = ? OR name LIKE ?)")
+            params.extend([term, term.replace("%", "").replace("_", "") + "%"])
+    if low_stock:
+        conds.append("quantity < ?")
+        params.append(LOW_STOCK_THRESHOLD)
+    if zero_price:
+        conds.append("price = 0")
+    return conds, params
+
+
+def fetch_item_page(conds=(), params=(), after_id=None, before_id=None, limit=PAGE_SIZE,
+                    db_path=DB_PATH):
+    """One keyset page of (id, barcode, name, price, quantity, version) in id order.
+
+    after_id continues forwards from a page's last id; before_id goes back
+    from a page's first id.
+    """
+    conds, params = list(conds), list(params)
+    if after_id is not None:
+        conds.append("id > ?")
+        params.append(after_id)
+    if before_id is not None:
+        conds.append("id < ?")
+        params.append(before_id)
+    where = " WHERE " + " AND ".join(conds) if conds else ""
+    order = "DESC" if before_id is not None else "ASC"
+    rows = fetch_all(f"""
+        SELECT id, barcode, name, price, quantity, version FROM items{where}
+        ORDER BY id {order} LIMIT ?
+    """, params + [limit], db_path=db_path)
+    return rows[::-1] if before_id is not None else rows
 
-DB_PATH = "db/billing.db"
 
 class InventoryEditor:
     def __init__(self, root):
         self.root = root
         self.root.title("Inventory Editor")
-        self.root.geometry("800x400")
+        self.root.geometry("800x500")
+
+        # Filter and paging state; see apply_filters
+        self.trigram = uses_trigram(get_connection(DB_PATH))
+        self.filter_conds, self.filter_params = [], []
+        self.filter_after_id = None
+        self.page_first_id = self.page_last_id = None
+        self.page_number = 1
+        self.match_count = 0
+
+        # Buffered edits {item_id: (version, {column: value})}, written by apply_changes
+        self.pending = {}
+        self.conflicts = set()
+        self.versions = {}
+        self.cell_editor = None
         
         # Initialize UI elements
         self.setup_ui()
         # Load initial data
-        self.load_inventory()
+        self.apply_filters()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def setup_ui(self):
+        # Filter bar
+        filter_frame = tk.Frame(self.root)
+        filter_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+
+        tk.Label(filter_frame, text="Search:").pack(side=tk.LEFT)
+        self.filter_entry = tk.Entry(filter_frame, width=30)
+        self.filter_entry.pack(side=tk.LEFT, padx=5)
+        self.filter_entry.bind("<KeyRelease>", self.on_filter_key)
+
+        self.low_stock_var = tk.BooleanVar()
+        self.zero_price_var = tk.BooleanVar()
+        tk.Checkbutton(filter_frame, text=f"Low stock (< {LOW_STOCK_THRESHOLD})",
+                       variable=self.low_stock_var, command=self.apply_filters).pack(side=tk.LEFT, padx=5)
+        tk.Checkbutton(filter_frame, text="Zero price",
+                       variable=self.zero_price_var, command=self.apply_filters).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(filter_frame, text="Next ▶", command=self.next_page).pack(side=tk.RIGHT)
+        self.page_label = tk.Label(filter_frame, text="")
+        self.page_label.pack(side=tk.RIGHT, padx=5)
+        tk.Button(filter_frame, text="◀ Prev", command=self.prev_page).pack(side=tk.RIGHT)
+
         # Treeview with scrollbar
         tree_frame = tk.Frame(self.root)
         tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
-        self.tree = ttk.Treeview(tree_frame, columns=("ID", "Barcode", "Name", "Price", "Qty"), show="headings")
+        self.tree = ttk.Treeview(tree_frame, columns=COLUMNS, show="headings")
         vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
         self.tree.configure(yscrollcommand=vsb.set)
 
-        for col in ("ID", "Barcode", "Name", "Price", "Qty"):
+        for col in COLUMNS:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=120, anchor=tk.CENTER)
 
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         vsb.pack(side=tk.RIGHT, fill=tk.Y)
         self.tree.bind("<<TreeviewSelect>>", self.on_item_select)
+        self.tree.bind("<Double-1>", self.begin_cell_edit)
+        self.tree.tag_configure("pending", background="#fff3c4")
+        self.tree.tag_configure("conflict", background="#f8c8c8")
 
         # Entry Form
         form_frame = tk.Frame(self.root)
@@ -63,24 +217,275 @@ class InventoryEditor:
         tk.Button(button_frame, text="Update Item", command=self.update_item, width=15).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Delete Item", command=self.delete_item, width=15).pack(side=tk.LEFT, padx=5)
 
-    def load_inventory(self):
-        # Clear existing items
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        tk.Label(button_frame, text="Price %:").pack(side=tk.LEFT, padx=(20, 0))
+        self.entry_percent = tk.Entry(button_frame, width=6)
+        self.entry_percent.pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Adjust Filtered Prices", command=self.bulk_price_change).pack(side=tk.LEFT, padx=5)
+
+        self.apply_button = tk.Button(button_frame, text="Apply Changes (0)", command=self.apply_changes, width=18)
+        self.apply_button.pack(side=tk.LEFT, padx=(20, 5))
+        tk.Button(button_frame, text="Discard", command=self.discard_changes).pack(side=tk.LEFT, padx=5)
+
+        self.status_label = tk.Label(self.root, text="", anchor=tk.W)
+        self.status_label.pack(fill=tk.X, padx=10, pady=(0, 5))
+
+    def on_filter_key(self, _event=None):
+        """Debounce typing in the filter box"""
+        if self.filter_after_id:
+            self.root.after_cancel(self.filter_after_id)
+        self.filter_after_id = self.root.after(FILTER_DEBOUNCE_MS, self.apply_filters)
+
+    def apply_filters(self):
+        """Re-query with the current filters, starting from the first page"""
+        self.filter_after_id = None
+        self.filter_conds, self.filter_params = item_filters(
+            self.filter_entry.get(), self.low_stock_var.get(), self.zero_price_var.get(),
+            self.trigram)
+        self.filter_where = " WHERE " + " AND ".join(self.filter_conds) if self.filter_conds else ""
+        try:
+            self.count_matches()
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Failed to load inventory: {str(e)}")
+            return
+        self.page_number = 1
+        self.load_inventory()
+
+    def count_matches(self):
+        self.match_count = fetch_one(f"SELECT COUNT(*) FROM items{self.filter_where}",
+                                     self.filter_params, db_path=DB_PATH)[0]
+
+    def update_page_label(self):
+        pages = max(1, -(-self.match_count // PAGE_SIZE))
+        self.page_label.config(text=f"Page {self.page_number} of {pages} ({self.match_count} items)")
 
-        # Connect to database and load items
-        conn = None
+    def load_inventory(self, after_id=None, before_id=None):
+        """Show one page of the filtered items; returns False if it was empty"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, barcode, name, price, quantity FROM items")
-            for row in cursor.fetchall():
-                self.tree.insert("", tk.END, values=row)
+            rows = fetch_item_page(self.filter_conds, self.filter_params, after_id, before_id)
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to load inventory: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
+            return False
+        if not rows and (after_id is not None or before_id is not None):
+            return False
+
+        self.cancel_cell_edit()
+        self.tree.delete(*self.tree.get_children())
+        self.versions = {}
+        for row in rows:
+            self.versions[row[0]] = row[5]
+            self.tree.insert("", tk.END, iid=str(row[0]), values=self.shown_values(row),
+                             tags=self.row_tags(row[0]))
+        self.page_first_id = rows[0][0] if rows else None
+        self.page_last_id = rows[-1][0] if rows else None
+        self.update_page_label()
+        return True
+
+    def next_page(self):
+        if self.page_last_id is None:
+            return
+        self.page_number += 1
+        if not self.load_inventory(after_id=self.page_last_id):
+            self.page_number -= 1
+
+    def prev_page(self):
+        if self.page_first_id is None or self.page_number <= 1:
+            return
+        self.page_number -= 1
+        if not self.load_inventory(before_id=self.page_first_id):
+            self.page_number += 1
+
+    def shown_values(self, row):
+        """A row's database values with any pending edits laid over them"""
+        values = list(row[:5])
+        for column, value in self.pending.get(row[0], (None, {}))[1].items():
+            values[COLUMNS.index(next(h for h, c in EDITABLE.items() if c == column))] = value
+        return values
+
+    def row_tags(self, item_id):
+        if item_id in self.conflicts:
+            return ("conflict",)
+        return ("pending",) if item_id in self.pending else ()
+
+    def refresh_rows(self, item_ids):
+        """Re-read items into their rows after a write, instead of reloading the page"""
+        item_ids = [int(i) for i in item_ids if self.tree.exists(str(i))]
+        if not item_ids:
+            return
+        marks = ", ".join("?" * len(item_ids))
+        rows = {row[0]: row for row in fetch_all(
+            f"SELECT id, barcode, name, price, quantity, version FROM items WHERE id IN ({marks})",
+            item_ids, db_path=DB_PATH)}
+        for item_id in item_ids:
+            row = rows.get(item_id)
+            if row is None:
+                self.tree.delete(str(item_id))
+                continue
+            self.versions[item_id] = row[5]
+            self.tree.item(str(item_id), values=self.shown_values(row), tags=self.row_tags(item_id))
+
+    def refresh_row(self, item_id):
+        self.refresh_rows([item_id])
+
+    def stage(self, item_id, changes, version=None):
+        """Buffer changes to one item; nothing is written until apply_changes"""
+        if item_id in self.pending:
+            version, buffered = self.pending[item_id]
+            changes = {**buffered, **changes}
+        elif version is None:
+            version = self.versions[item_id]
+        self.pending[item_id] = (version, changes)
+        self.update_pending_count()
+
+    def update_pending_count(self):
+        self.apply_button.config(text=f"Apply Changes ({len(self.pending)})")
+
+    def begin_cell_edit(self, event):
+        """Edit a cell in place on double-click; Enter or leaving the cell stages it"""
+        if self.tree.identify_region(event.x, event.y) != "cell":
+            return
+        iid = self.tree.identify_row(event.y)
+        column_id = self.tree.identify_column(event.x)
+        heading = COLUMNS[int(column_id[1:]) - 1]
+        if not iid or heading not in EDITABLE:
+            return
+        self.cancel_cell_edit()
+        x, y, width, height = self.tree.bbox(iid, column_id)
+        entry = tk.Entry(self.tree)
+        entry.insert(0, self.tree.set(iid, heading))
+        entry.select_range(0, tk.END)
+        entry.place(x=x, y=y, width=width, height=height)
+        entry.focus_set()
+        self.cell_editor = entry
+
+        def finish(_event=None):
+            if self.cell_editor is not entry:
+                return
+            text = entry.get()
+            self.cancel_cell_edit()
+            try:
+                value = parse_cell(EDITABLE[heading], text)
+            except ValueError as e:
+                messagebox.showerror("Input Error", str(e))
+                return
+            if str(value) != self.tree.set(iid, heading):
+                self.stage(int(iid), {EDITABLE[heading]: value})
+                self.tree.set(iid, heading, value)
+                self.tree.item(iid, tags=self.row_tags(int(iid)))
+
+        entry.bind("<Return>", finish)
+        entry.bind("<FocusOut>", finish)
+        entry.bind("<Escape>", lambda _event: self.cancel_cell_edit())
+
+    def cancel_cell_edit(self):
+        if self.cell_editor is not None:
+            editor, self.cell_editor = self.cell_editor, None
+            editor.destroy()
+
+    def bulk_price_change(self):
+        """Stage a percentage price change for every item matching the filters"""
+        try:
+            percent = float(self.entry_percent.get())
+            if percent <= -100:
+                raise ValueError("Price change must be above -100%")
+        except ValueError as e:
+            messagebox.showerror("Input Error", str(e))
+            return
+        try:
+            rows = fetch_all(f"SELECT id, price, version FROM items{self.filter_where}",
+                             self.filter_params, db_path=DB_PATH)
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Failed to load items: {str(e)}")
+            return
+        if not rows:
+            return
+        if not messagebox.askyesno("Adjust Prices",
+                                   f"Change the price of {len(rows)} item(s) by {percent:+g}%?\n"
+                                   "Nothing is saved until you click Apply Changes."):
+            return
+
+        factor = 1 + percent / 100
+        for item_id, price, version in rows:
+            price = self.pending.get(item_id, (None, {}))[1].get("price", price)
+            self.stage(item_id, {"price": round(price * factor, 2)}, version)
+        self.refresh_rows(self.tree.get_children())
+        self.status_label.config(text=f"{len(rows)} price change(s) staged")
+
+    def apply_changes(self):
+        """Write every buffered edit in one transaction, with per-row version checks"""
+        self.cancel_cell_edit()
+        if not self.pending:
+            return
+        try:
+            applied, conflicts = get_writer(DB_PATH).submit(
+                apply_item_edits, dict(self.pending)).result(WRITE_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            messagebox.showerror("Database Error",
+                                 f"The database did not answer within {WRITE_TIMEOUT} s; the changes may "
+                                 "still be saved. Reload before applying them again.")
+            return
+        except sqlite3.IntegrityError as e:
+            messagebox.showerror("Database Error",
+                                 f"Nothing was saved, a barcode is already in use: {str(e)}")
+            return
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            messagebox.showerror("Database Error", f"Nothing was saved: {str(e)}")
+            return
+
+        catalog = get_catalog(DB_PATH)
+        if len(applied) > CATALOG_RELOAD_AT:
+            catalog.load()
+        else:
+            for item_id in applied:
+                catalog.refresh_id(item_id)
+        for item_id in applied:
+            del self.pending[item_id]
+            self.conflicts.discard(item_id)
+
+        # Rebase conflicting edits on the current row so the user can review
+        # the latest values and apply again to keep them
+        current = {}
+        if conflicts:
+            marks = ", ".join("?" * len(conflicts))
+            current = {row[0]: row[1:] for row in fetch_all(
+                f"SELECT id, version, name FROM items WHERE id IN ({marks})", conflicts, db_path=DB_PATH)}
+        for item_id in conflicts:
+            if item_id in current:
+                self.pending[item_id] = (current[item_id][0], self.pending[item_id][1])
+                self.conflicts.add(item_id)
+            else:
+                del self.pending[item_id]
+                self.conflicts.discard(item_id)
+
+        self.refresh_rows(applied + conflicts)
+        self.update_pending_count()
+        self.status_label.config(text=f"{len(applied)} item(s) saved")
+        if conflicts:
+            names = ", ".join(current[i][1] for i in conflicts if i in current)
+            gone = sum(1 for i in conflicts if i not in current)
+            message = f"{len(conflicts)} item(s) were changed elsewhere since you edited them."
+            if names:
+                message += (f"\n\nStill pending, now showing the latest values: {names}.\n"
+                            "Review them and click Apply Changes again to keep your edits.")
+            if gone:
+                message += f"\n\n{gone} item(s) had been deleted; their edits were dropped."
+            messagebox.showwarning("Edit Conflict", message)
+
+    def discard_changes(self):
+        self.cancel_cell_edit()
+        if not self.pending:
+            return
+        ids = list(self.pending)
+        self.pending.clear()
+        self.conflicts.clear()
+        self.refresh_rows(ids)
+        self.update_pending_count()
+        self.status_label.config(text="Changes discarded")
+
+    def on_close(self):
+        if self.pending and not messagebox.askyesno(
+                "Unsaved Changes", f"Discard {len(self.pending)} unsaved change(s)?"):
+            return
+        self.root.destroy()
 
     def on_item_select(self, event):
         selected = self.tree.focus()
@@ -103,42 +508,19 @@ class InventoryEditor:
         self.entry_qty.insert(0, values[4])
 
     def update_item(self):
+        """Stage the form's values for the selected item"""
         try:
             item_id = int(self.entry_id.get())
-            price = float(self.entry_price.get())
-            qty = int(self.entry_qty.get())
-            if qty < 0:
-                raise ValueError("Quantity cannot be negative")
+            changes = {column: parse_cell(column, entry.get()) for column, entry in (
+                ("barcode", self.entry_barcode), ("name", self.entry_name),
+                ("price", self.entry_price), ("quantity", self.entry_qty))}
         except ValueError as e:
             messagebox.showerror("Input Error", str(e))
             return
-
-        name = self.entry_name.get().strip()
-        barcode = self.entry_barcode.get().strip()
-
-        if not name or not barcode:
-            messagebox.showerror("Input Error", "Name and Barcode cannot be empty")
+        if item_id not in self.versions:
             return
-
-        conn = None
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE items 
-                SET barcode = ?, name = ?, price = ?, quantity = ?
-                WHERE id = ?
-            """, (barcode, name, price, qty, item_id))
-            conn.commit()
-            messagebox.showinfo("Success", "Item updated successfully")
-            self.load_inventory()
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to update item: {str(e)}")
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                conn.close()
+        self.stage(item_id, changes)
+        self.refresh_row(item_id)
 
     def delete_item(self):
         item_id = self.entry_id.get()
@@ -150,25 +532,28 @@ class InventoryEditor:
         if not confirm:
             return
             
-        conn = None
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM items WHERE id = ?", (item_id,))
-            conn.commit()
+            get_writer(DB_PATH).submit(remove_item, int(item_id)).result(WRITE_TIMEOUT)
+            get_catalog(DB_PATH).remove(item_id)
+            self.pending.pop(int(item_id), None)
+            self.conflicts.discard(int(item_id))
+            self.update_pending_count()
+            self.refresh_row(item_id)
+            # The item may not have matched the filters, so recount rather than decrement
+            self.count_matches()
+            self.update_page_label()
             messagebox.showinfo("Success", "Item deleted successfully")
-            self.load_inventory()
-        except sqlite3.Error as e:
+        except concurrent.futures.TimeoutError:
+            messagebox.showerror("Database Error",
+                                 f"The database did not answer within {WRITE_TIMEOUT} s; the item may "
+                                 "still be deleted.")
+        except (sqlite3.Error, OSError, RuntimeError) as e:
             messagebox.showerror("Database Error", f"Failed to delete item: {str(e)}")
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                conn.close()
 
 
 # Main application entry point
 if __name__ == "__main__":
+    ensure_schema(DB_PATH)
     root = tk.Tk()
     app = InventoryEditor(root)
     root.mainloop()
\ No newline at end of file
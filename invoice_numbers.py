@@ -0,0 +1,267 @@
+import argparse
+import atexit
+import datetime
+import heapq
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from database import BILLING_DB, fetch_all, get_connection, transaction
+from journal import ensure_journal
+from sales import record_sale
+from sales_summary import ensure_summary_tables
+
+INVOICE_PREFIX = "HYP-"
+BLOCK_SIZE = 20  # invoice numbers reserved per trip to the settings row
+
+
+def ensure_invoice_tables(cursor):
+    """Create the block reservation table and the invoice uniqueness index.
+
+    Returns False if existing duplicate invoice numbers prevent the index.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS invoice_blocks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            terminal_id TEXT NOT NULL,
+            first_number INTEGER NOT NULL,
+            last_number INTEGER NOT NULL,
+            reserved_at TEXT NOT NULL,
+            closed_at TEXT
+        )
+    """)
+    cursor.execute("""
+        SELECT 1 FROM sales GROUP BY invoice_number HAVING COUNT(*) > 1 LIMIT 1
+    """)
+    if cursor.fetchone():
+        return False
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_invoice_number
+        ON sales (invoice_number)
+    """)
+    return True
+
+
+def default_terminal_id():
+    return os.environ.get("POS_TERMINAL_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def format_invoice_number(number):
+    return f"{INVOICE_PREFIX}{number}"
+
+
+class InvoiceAllocator:
+    """Hands out invoice numbers from blocks reserved per terminal.
+
+    Reserving a block is one short transaction that bumps
+    settings.last_invoice_number by block_size and records the range in
+    invoice_blocks; numbers within the block then come from memory, so
+    checkouts on different terminals never wait on the settings row.
+    Numbers from a failed sale are released back and reused first.
+    Numbers never used (released at shutdown, or lost to a crash) show up
+    in list_gaps().
+    """
+
+    def __init__(self, db_path=BILLING_DB, terminal_id=None, block_size=BLOCK_SIZE):
+        self.db_path = db_path
+        self.terminal_id = terminal_id or default_terminal_id()
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.released = []      # heap of numbers handed back by failed sales
+        self.next_number = None
+        self.block_end = None
+        self.block_id = None
+
+    def _reserve_block(self):
+        if get_connection(self.db_path).in_transaction:
+            # Inside a caller's transaction the reservation could roll back
+            # after we had already handed its numbers out
+            raise RuntimeError("Invoice blocks must be reserved outside a transaction")
+
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with transaction(self.db_path) as cursor:
+            if self.block_id is not None:
+                cursor.execute("UPDATE invoice_blocks SET closed_at = ? WHERE id = ?",
+                               (now, self.block_id))
+            cursor.execute("""
+                UPDATE settings SET value = CAST(value AS INTEGER) + ?
+                WHERE key = 'last_invoice_number'
+            """, (self.block_size,))
+            cursor.execute("SELECT value FROM settings WHERE key = 'last_invoice_number'")
+            last = int(cursor.fetchone()[0])
+            first = last - self.block_size + 1
+            cursor.execute("""
+                INSERT INTO invoice_blocks (terminal_id, first_number, last_number, reserved_at)
+                VALUES (?, ?, ?, ?)
+            """, (self.terminal_id, first, last, now))
+            block_id = cursor.lastrowid
+
+        self.block_id = block_id
+        self.next_number = first
+        self.block_end = last
+
+    def _take(self, peek):
+        with self.lock:
+            if self.released:
+                number = self.released[0] if peek else heapq.heappop(self.released)
+                return format_invoice_number(number)
+            if self.next_number is None or self.next_number > self.block_end:
+                self._reserve_block()
+            number = self.next_number
+            if not peek:
+                self.next_number += 1
+            return format_invoice_number(number)
+
+    def allocate(self):
+        """Next invoice number for this terminal, e.g. 'HYP-10021'"""
+        return self._take(peek=False)
+
+    def peek(self):
+        """The number allocate() would return next, without consuming it"""
+        return self._take(peek=True)
+
+    def release(self, invoice_number):
+        """Hand back a number whose sale was not saved"""
+        number = int(invoice_number[len(INVOICE_PREFIX):])
+        with self.lock:
+            heapq.heappush(self.released, number)
+
+    def close(self):
+        """Mark the current block closed; its unused numbers become gaps"""
+        with self.lock:
+            if self.block_id is None:
+                return
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            with transaction(self.db_path) as cursor:
+                cursor.execute("UPDATE invoice_blocks SET closed_at = ? WHERE id = ?",
+                               (now, self.block_id))
+            self.block_id = self.next_number = self.block_end = None
+            self.released = []
+
+
+def list_gaps(db_path=BILLING_DB, include_open=False):
+    """Numbers inside reserved blocks that no saved sale uses.
+
+    Blocks still held by a running terminal are skipped unless include_open
+    is set, since their unused numbers are not gaps yet.
+    """
+    blocks = fetch_all(f"""
+        SELECT first_number, last_number FROM invoice_blocks
+        {"" if include_open else "WHERE closed_at IS NOT NULL"}
+        ORDER BY first_number
+    """, db_path=db_path)
+    if not blocks:
+        return []
+    used = {
+        row[0]
+        for row in fetch_all(
+            "SELECT CAST(substr(invoice_number, ?) AS INTEGER) FROM sales",
+            (len(INVOICE_PREFIX) + 1,),
+            db_path=db_path,
+        )
+    }
+    return [n for first, last in blocks for n in range(first, last + 1) if n not in used]
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_allocator(db_path=BILLING_DB):
+    """Process-wide allocator, shared by every POS window in this process"""
+    with _allocators_lock:
+        allocator = _allocators.get(db_path)
+        if allocator is None:
+            allocator = _allocators[db_path] = InvoiceAllocator(db_path)
+            atexit.register(allocator.close)
+        return allocator
+
+
+# --- Multi-process stress test ---
+
+def _stress_terminal(db_path, terminal, sales_count, block_size):
+    allocator = InvoiceAllocator(db_path, f"stress-{terminal}", block_size)
+    cart = [{'id': 1, 'qty': 1, 'price': 10.0}]
+    for _ in range(sales_count):
+        invoice_number = allocator.allocate()
+        with transaction(db_path) as cursor:
+            record_sale(cursor, cart, terminal, invoice_number)
+    allocator.close()
+
+
+def stress(processes, sales_per_process, block_size):
+    """Run simulated terminals against a scratch database and check for duplicates"""
+    db_dir = tempfile.mkdtemp(prefix="invoice_stress_")
+    db_path = os.path.join(db_dir, "stress.db")
+    with transaction(db_path) as cursor:
+        cursor.execute("CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT)")
+        cursor.execute("INSERT INTO settings VALUES ('last_invoice_number', '10000')")
+        cursor.execute("""
+            CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, barcode TEXT,
+                                name TEXT, price REAL, quantity INTEGER)
+        """)
+        cursor.execute("INSERT INTO items (barcode, name, price, quantity) VALUES ('1', 'Stress', 10, 0)")
+        cursor.execute("""
+            CREATE TABLE sales (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL, ts TEXT,
+                                total REAL NOT NULL, invoice_number TEXT NOT NULL,
+                                table_number INTEGER)
+        """)
+        cursor.execute("""
+            CREATE TABLE sale_items (id INTEGER PRIMARY KEY AUTOINCREMENT, sale_id INTEGER,
+                                     item_id INTEGER, quantity INTEGER, price REAL)
+        """)
+        cursor.execute("""
+            CREATE TABLE ledger (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, ts TEXT, type TEXT,
+                                 item_id INTEGER, item_name TEXT, quantity INTEGER,
+                                 price REAL, notes TEXT)
+        """)
+        ensure_invoice_tables(cursor)
+        ensure_summary_tables(cursor)
+        ensure_journal(cursor)
+    get_connection(db_path).execute("PRAGMA journal_mode = WAL")
+
+    workers = [
+        multiprocessing.Process(target=_stress_terminal,
+                                args=(db_path, n, sales_per_process, block_size))
+        for n in range(processes)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    failed = [w.exitcode for w in workers if w.exitcode != 0]
+    total, distinct = fetch_all(
+        "SELECT COUNT(*), COUNT(DISTINCT invoice_number) FROM sales", db_path=db_path)[0]
+    gaps = list_gaps(db_path)
+    print(f"{processes} terminals x {sales_per_process} sales, block size {block_size}")
+    print(f"  saved {total} sales in {elapsed:.2f}s ({total / elapsed:.0f} sales/sec)")
+    print(f"  distinct invoice numbers: {distinct}, duplicates: {total - distinct}")
+    print(f"  unused numbers in closed blocks: {len(gaps)}")
+    print(f"  failed terminals: {len(failed)}")
+    print(f"  database: {db_path}")
+    return not failed and total == distinct == processes * sales_per_process
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Invoice number allocator tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_stress = sub.add_parser("stress", help="multi-process duplicate check")
+    p_stress.add_argument("--processes", type=int, default=8)
+    p_stress.add_argument("--sales", type=int, default=500, help="sales per process")
+    p_stress.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    p_gaps = sub.add_parser("gaps", help="list unused invoice numbers")
+    p_gaps.add_argument("--db", default=BILLING_DB)
+    p_gaps.add_argument("--include-open", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "stress":
+        ok = stress(args.processes, args.sales, args.block_size)
+        raise SystemExit(0 if ok else 1)
+    for number in list_gaps(args.db, args.include_open):
+        print(format_invoice_number(number))
@@ -0,0 +1,246 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from database import BILLING_DB, fetch_all, fetch_one
+from invoice_numbers import INVOICE_PREFIX
+
+STORE_NAME = "HD Super Mart"
+STORE_ADDRESS = "12505 Bel Red Road, Ste 212, Bellevue, WA 98005"
+STORE_PHONE = "(425) 389 0173"
+
+BATCH_SIZE = 50  # invoices handed to a worker process at a time
+DELETED_ITEM = "<deleted item>"  # shown for sale lines whose item no longer exists
+
+# TrueType fonts that carry the rupee sign; Helvetica is the fallback
+FONT_CANDIDATES = [
+    (r"C:\Windows\Fonts\arial.ttf", r"C:\Windows\Fonts\arialbd.ttf"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/Library/Fonts/Arial Unicode.ttf", "/Library/Fonts/Arial Unicode.ttf"),
+]
+
+_fonts = None
+_fonts_lock = threading.Lock()
+
+
+def sanitize(text):
+    """Replace characters the built-in PDF fonts cannot draw"""
+    replacements = {
+        '\u2009': ' ',   # Thin space
+        '\u20b9': 'Rs.', # Indian Rupee sign
+        '\u2013': '-',   # En dash
+        '\u2019': "'"    # Right single quote
+    }
+    for char, replacement in replacements.items():
+        text = text.replace(char, replacement)
+    return text.encode('ascii', 'ignore').decode('ascii')
+
+
+def get_fonts():
+    """Register fonts once per process and return (regular, bold, text_filter)"""
+    global _fonts
+    with _fonts_lock:
+        if _fonts is None:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+
+            _fonts = ("Helvetica", "Helvetica-Bold", sanitize)
+            for regular, bold in FONT_CANDIDATES:
+                if os.path.isfile(regular) and os.path.isfile(bold):
+                    try:
+                        pdfmetrics.registerFont(TTFont("InvoiceSans", regular))
+                        pdfmetrics.registerFont(TTFont("InvoiceSans-Bold", bold))
+                    except Exception:
+                        continue
+                    _fonts = ("InvoiceSans", "InvoiceSans-Bold", lambda text: text)
+                    break
+        return _fonts
+
+
+def default_invoice_dir():
+    """~/Downloads/invoices, or ~/invoices when there is no Downloads folder"""
+    user_home = os.path.expanduser("~")
+    downloads = os.path.join(user_home, "Downloads")
+    if not os.path.isdir(downloads):
+        downloads = user_home
+    return os.path.join(downloads, "invoices")
+
+
+def load_invoice(invoice_number, db_path=BILLING_DB):
+    """Sale header and lines as a dict, or None if the invoice does not exist"""
+    row = fetch_one(
+        "SELECT id, date, total FROM sales WHERE invoice_number = ?",
+        (invoice_number,), db_path=db_path
+    )
+    if not row:
+        return None
+    sale_id, date_str, total = row
+    lines = fetch_all("""
+        SELECT COALESCE(items.name, ?), sale_items.quantity, sale_items.price
+        FROM sale_items
+        LEFT JOIN items ON sale_items.item_id = items.id
+        WHERE sale_id = ?
+        ORDER BY sale_items.id
+    """, (DELETED_ITEM, sale_id), db_path=db_path)
+    return {'invoice_number': invoice_number, 'date': date_str, 'total': total, 'lines': lines}
+
+
+def render_invoice(invoice, filename):
+    """Draw one invoice dict to filename"""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+
+    regular, bold, text = get_fonts()
+    c = canvas.Canvas(filename, pagesize=letter)
+    w, h = letter
+
+    # Header
+    c.setFont(bold, 16)
+    c.drawString(72, h-72, STORE_NAME)
+    c.setFont(regular, 12)
+    c.drawString(72, h-90, STORE_ADDRESS)
+    c.drawString(72, h-108, STORE_PHONE)
+
+    # Invoice info
+    c.drawString(72, h-140, f"Invoice #: {invoice['invoice_number']}")
+    c.drawString(72, h-155, f"Date:       {invoice['date']}")
+    c.drawString(72, h-170, "Cashier:    Admin")
+
+    # Table header
+    y = h-220
+    c.setFont(bold, 12)
+    c.drawString(72,  y,   "Item")
+    c.drawString(300, y,   "Qty")
+    c.drawString(400, y,   "Price")
+    c.drawString(500, y,   "Subtotal")
+
+    # Table rows, continuing on a new page when this one is full
+    y -= 24
+    c.setFont(regular, 12)
+    for name, qty, price in invoice['lines']:
+        if y < 72:
+            c.showPage()
+            c.setFont(regular, 12)
+            y = h-72
+        subtotal = qty * price
+        c.drawString(72,  y,   text(str(name)))
+        c.drawString(300, y,   str(qty))
+        c.drawString(400, y,   text(f"₹{price:.2f}"))
+        c.drawString(500, y,   text(f"₹{subtotal:.2f}"))
+        y -= 20
+
+    # Grand total
+    c.setFont(bold, 14)
+    c.drawString(400, y-40, text(f"Total: ₹{invoice['total']:.2f}"))
+
+    c.save()
+    return filename
+
+
+# --- Bulk regeneration ---
+
+def load_invoices(db_path=BILLING_DB, from_date=None, to_date=None,
+                  from_invoice=None, to_invoice=None):
+    """All invoices in a date and/or invoice-number range, in two queries"""
+    conds, params = [], []
+    if from_date:
+        conds.append("ts >= ?")
+        params.append(from_date)
+    if to_date:
+        conds.append("ts < date(?, '+1 day')")
+        params.append(to_date)
+    number = f"CAST(substr(invoice_number, {len(INVOICE_PREFIX) + 1}) AS INTEGER)"
+    if from_invoice:
+        conds.append(f"{number} >= ?")
+        params.append(int(str(from_invoice).removeprefix(INVOICE_PREFIX)))
+    if to_invoice:
+        conds.append(f"{number} <= ?")
+        params.append(int(str(to_invoice).removeprefix(INVOICE_PREFIX)))
+    where = " WHERE " + " AND ".join(conds) if conds else ""
+
+    invoices = {}
+    for sale_id, invoice_number, date_str, total in fetch_all(
+            f"SELECT id, invoice_number, date, total FROM sales{where} ORDER BY id",
+            params, db_path=db_path):
+        invoices[sale_id] = {'invoice_number': invoice_number, 'date': date_str,
+                             'total': total, 'lines': []}
+
+    for sale_id, name, qty, price in fetch_all(f"""
+            SELECT sale_items.sale_id, COALESCE(items.name, ?), sale_items.quantity, sale_items.price
+            FROM sale_items
+            LEFT JOIN items ON sale_items.item_id = items.id
+            WHERE sale_items.sale_id IN (SELECT id FROM sales{where})
+            ORDER BY sale_items.sale_id, sale_items.id
+            """, [DELETED_ITEM, *params], db_path=db_path):
+        invoices[sale_id]['lines'].append((name, qty, price))
+
+    return list(invoices.values())
+
+
+def _render_batch(output_dir, invoices):
+    """Worker process: render a batch, returning (ok, failures)"""
+    ok, failures = 0, []
+    for invoice in invoices:
+        try:
+            render_invoice(invoice, os.path.join(output_dir, f"{invoice['invoice_number']}.pdf"))
+            ok += 1
+        except Exception as e:
+            failures.append((invoice['invoice_number'], str(e)))
+    return ok, failures
+
+
+def regenerate(output_dir, workers=None, db_path=BILLING_DB, **ranges):
+    """Re-create invoice PDFs for a range across a process pool.
+
+    ranges are passed to load_invoices. Prints progress and throughput and
+    returns (rendered, failures).
+    """
+    start = time.perf_counter()
+    invoices = load_invoices(db_path, **ranges)
+    loaded = time.perf_counter()
+    print(f"Loaded {len(invoices)} invoices in {loaded - start:.2f}s")
+    if not invoices:
+        return 0, []
+
+    os.makedirs(output_dir, exist_ok=True)
+    batches = [invoices[i:i + BATCH_SIZE] for i in range(0, len(invoices), BATCH_SIZE)]
+    rendered, failures = 0, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_render_batch, output_dir, batch) for batch in batches]
+        for future in as_completed(futures):
+            ok, failed = future.result()
+            rendered += ok
+            failures.extend(failed)
+            elapsed = time.perf_counter() - loaded
+            print(f"  {rendered + len(failures)}/{len(invoices)} "
+                  f"({rendered / elapsed:.1f} invoices/sec)", flush=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {rendered} invoices to {output_dir} in {elapsed:.2f}s "
+          f"({rendered / elapsed:.1f} invoices/sec), {len(failures)} failed")
+    for invoice_number, error in failures:
+        print(f"  {invoice_number}: {error}")
+    return rendered, failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate invoice PDFs in bulk")
+    parser.add_argument("--db", default=BILLING_DB)
+    parser.add_argument("--out", default="invoices", help="output folder")
+    parser.add_argument("--from-date", help="YYYY-MM-DD")
+    parser.add_argument("--to-date", help="YYYY-MM-DD (inclusive)")
+    parser.add_argument("--from-invoice", help="e.g. HYP-10001")
+    parser.add_argument("--to-invoice", help="e.g. HYP-10500 (inclusive)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    _rendered, _failures = regenerate(
+        args.out, args.workers, args.db,
+        from_date=args.from_date, to_date=args.to_date,
+        from_invoice=args.from_invoice, to_invoice=args.to_invoice,
+    )
+    raise SystemExit(1 if _failures else 0)
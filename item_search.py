@@ -0,0 +1,75 @@
+import sqlite3
+
+
+def ensure_name_index(cursor):
+    """Create the items_fts full-text index on items.name and its sync triggers.
+
+    Uses the trigram tokenizer (substring matches, SQLite 3.34+) and falls back
+    to the default word tokenizer on older SQLite builds.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'")
+    if cursor.fetchone():
+        return
+
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE items_fts USING fts5(
+                name, content='items', content_rowid='id', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE items_fts USING fts5(
+                name, content='items', content_rowid='id'
+            )
+        """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+            INSERT INTO items_fts(rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+            INSERT INTO items_fts(items_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF name ON items BEGIN
+            INSERT INTO items_fts(items_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO items_fts(rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+
+    # Index the rows that already exist
+    cursor.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+
+
+def uses_trigram(conn):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'items_fts'").fetchone()
+    return bool(row) and "trigram" in row[0]
+
+
+def build_match(term, trigram=True):
+    """Turn user input into an FTS5 MATCH expression (None if too short)"""
+    words = [w.replace('"', '""') for w in term.split()]
+    if trigram:
+        # Trigram needs at least 3 characters per phrase to use the index
+        words = [w for w in words if len(w) >= 3]
+        return " AND ".join(f'"{w}"' for w in words) or None
+    return " AND ".join(f'"{w}"*' for w in words) or None
+
+
+def search_names(conn, term, limit=50, trigram=True):
+    """Items whose name contains term, as (id, name, price) rows"""
+    match = build_match(term, trigram)
+    if not match:
+        return []
+    cursor = conn.execute("""
+        SELECT items.id, items.name, items.price
+        FROM items_fts
+        JOIN items ON items.id = items_fts.rowid
+        WHERE items_fts MATCH ?
+        LIMIT ?
+    """, (match, limit))
+    return cursor.fetchall()
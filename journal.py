@@ -0,0 +1,286 @@
+import argparse
+import atexit
+import concurrent.futures
+import datetime
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+from database import BILLING_DB, close_thread_connections, get_connection, transaction
+
+GROUP_COMMIT_MS = float(os.environ.get("POS_GROUP_COMMIT_MS", "5"))  # longest a write waits to share a commit
+MAX_BATCH = 500  # operations per commit at most
+WRITE_TIMEOUT = 30  # seconds a screen waits for its write before giving up
+
+
+def ensure_journal(cursor):
+    """Create the append-only stock journal and the trigger that feeds the ledger.
+
+    Every sale line, purchase and manual adjustment is appended here and
+    copied into ledger by journal_ledger_ai, so LedgerView sees all of
+    them. Journal rows can never be updated or deleted.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            item_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER NOT NULL,
+            price REAL,
+            ref TEXT
+        )
+    """)
+    # ledger.ts is filled here, normalized as ledger_ts_ai would, so that
+    # trigger has nothing to do and each journal row costs one ledger insert
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS journal_ledger_ai AFTER INSERT ON journal BEGIN
+            INSERT INTO ledger (date, ts, type, item_id, item_name, quantity, price, notes)
+            VALUES (NEW.ts, COALESCE(datetime(NEW.ts), NEW.ts), NEW.kind, NEW.item_id,
+                    NEW.item_name, NEW.quantity, NEW.price, NEW.ref);
+        END
+    """)
+    for action in ("UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS journal_no_{action.lower()} BEFORE {action} ON journal BEGIN
+                SELECT RAISE(ABORT, 'journal is append-only');
+            END
+        """)
+
+
+def now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def append(cursor, kind, lines, ref=None, ts=None, by="id"):
+    """Journal (item, quantity, price) lines of one kind: Sale, Purchase or Adjustment.
+
+    item is an item id, or a barcode when by="barcode"; a price of None
+    journals the item's current price. Lines for items that do not exist
+    are skipped, as no stock of theirs moved.
+    """
+    if by not in ("id", "barcode"):
+        raise ValueError(f"Cannot look items up by {by!r}")
+    ts = ts or now()
+    cursor.executemany(f"""
+        INSERT INTO journal (ts, kind, item_id, item_name, quantity, price, ref)
+        SELECT ?, ?, id, name, ?, COALESCE(?, price), ? FROM items WHERE {by} = ?
+    """, [(ts, kind, qty, price, ref, item) for item, qty, price in lines])
+
+
+def adjust_stock(cursor, item_id, delta, notes=None):
+    """Add delta (may be negative) to an item's stock and journal it"""
+    cursor.execute("UPDATE items SET quantity = quantity + ? WHERE id = ?", (delta, item_id))
+    if not cursor.rowcount:
+        raise ValueError(f"No item with id {item_id}")
+    append(cursor, "Adjustment", [(item_id, delta, None)], notes)
+
+
+class GroupCommitWriter:
+    """One thread that writes to a database on behalf of every screen.
+
+    submit(op, *args) queues op(cursor, *args) and returns a Future for its
+    result. The thread takes every queued op, runs each in its own
+    savepoint inside one transaction and commits once, so a burst of
+    writes pays for one commit instead of one each. While writes are
+    arriving concurrently (the last group held more than one) it also
+    waits up to budget_ms for more to join, or until the group is as big
+    as the last one; a lone write is committed straight away. An op that
+    raises is rolled back on its own and its Future gets the exception;
+    the rest of the group still commits. Futures are resolved only after
+    the commit.
+    """
+
+    def __init__(self, db_path=BILLING_DB, budget_ms=GROUP_COMMIT_MS, max_batch=MAX_BATCH):
+        self.db_path = db_path
+        self.budget = budget_ms / 1000
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.commits = 0
+        self.ops = 0
+        self.last_group = 0
+        self.closed = False
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="group-commit", daemon=True)
+        self.thread.start()
+
+    def submit(self, op, *args):
+        future = concurrent.futures.Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("writer is closed")
+            self.queue.put((op, args, future))
+        return future
+
+    def run(self):
+        stopping = False
+        batch = []
+        try:
+            while not stopping:
+                item = self.queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + (self.budget if self.last_group > 1 else 0)
+                while len(batch) < self.max_batch:
+                    if len(batch) >= self.last_group:
+                        # Every writer from the last group is back; take what is queued and go
+                        deadline = 0
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self.last_group = len(batch)
+                self.commit(batch)
+                batch = []
+        except BaseException as e:
+            # The thread cannot go on; refuse new work and fail everything
+            # still waiting, so no caller blocks on a write that never runs
+            with self.lock:
+                self.closed = True
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    batch.append(item)
+            self.fail(batch, e)
+            raise
+        finally:
+            close_thread_connections()
+
+    @staticmethod
+    def fail(batch, error):
+        """Give error to every future in batch that has no outcome yet"""
+        for _op, _args, future in batch:
+            if not future.done() and (future.running() or future.set_running_or_notify_cancel()):
+                future.set_exception(error)
+
+    def commit(self, batch):
+        results = []
+        try:
+            conn = get_connection(self.db_path)
+            if conn.in_transaction:
+                # Never let a group land inside a transaction a failed commit left open
+                conn.execute("ROLLBACK")
+
+            with transaction(self.db_path):
+                for op, args, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        results.append(None)
+                        continue
+                    try:
+                        with transaction(self.db_path) as cursor:
+                            results.append((True, op(cursor, *args)))
+                    except Exception as e:
+                        results.append((False, e))
+        except Exception as e:
+            # The database could not be opened, or BEGIN or COMMIT failed
+            # (e.g. another till held the lock past the busy timeout);
+            # nothing in the group was written, and every caller must hear
+            # so, started or not
+            self.fail(batch, e)
+            return
+
+        self.commits += 1
+        self.ops += len(batch)
+        for result, (_op, _args, future) in zip(results, batch):
+            if result is None:
+                continue
+            ok, value = result
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def close(self):
+        """Commit whatever is queued and stop the thread"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(None)
+        self.thread.join()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path=BILLING_DB):
+    """Process-wide writer, shared by every window in this process"""
+    with _writers_lock:
+        writer = _writers.get(db_path)
+        if writer is None:
+            writer = _writers[db_path] = GroupCommitWriter(db_path)
+            atexit.register(writer.close)
+        return writer
+
+
+# --- Benchmark: one commit per write vs group commit ---
+
+def _bench_worker(db_path, writer, ops, items, worker):
+    for n in range(ops):
+        item_id = (worker * ops + n) % items + 1
+        if writer:
+            writer.submit(adjust_stock, item_id, 1, "bench").result()
+        else:
+            with transaction(db_path) as cursor:
+                adjust_stock(cursor, item_id, 1, "bench")
+    close_thread_connections()
+
+
+def bench(writers=8, ops=100, budget_ms=GROUP_COMMIT_MS, items=100):
+    """ops stock adjustments from each of writers threads, committed per write and grouped"""
+    from migrations import migrate
+
+    folder = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(folder, "bench.db")
+        migrate(db_path)
+        with transaction(db_path) as cursor:
+            cursor.executemany("INSERT INTO items (barcode, name, price, quantity) VALUES (?, ?, 1.0, 0)",
+                               [(f"bench-{i}", f"Bench item {i}") for i in range(items)])
+
+        results = {}
+        for mode in ("per-write", "group"):
+            writer = GroupCommitWriter(db_path, budget_ms) if mode == "group" else None
+            threads = [threading.Thread(target=_bench_worker, args=(db_path, writer, ops, items, w))
+                       for w in range(writers)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            total = writers * ops
+            commits = writer.commits if writer else total
+            if writer:
+                writer.close()
+            results[mode] = (total / elapsed, commits)
+            print(f"{mode:>9}: {total} writes in {elapsed:.2f}s ({total / elapsed:.0f}/s), "
+                  f"{commits} commits, {total / commits:.1f} writes per commit")
+        close_thread_connections()
+        return results
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-write commits with group commit")
+    parser.add_argument("--writers", type=int, default=8, help="concurrent writer threads")
+    parser.add_argument("--ops", type=int, default=100, help="writes per thread")
+    parser.add_argument("--budget-ms", type=float, default=GROUP_COMMIT_MS,
+                        help="group commit latency budget (default POS_GROUP_COMMIT_MS)")
+    args = parser.parse_args()
+    bench(args.writers, args.ops, args.budget_ms)
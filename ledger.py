@@ -1,9 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
+import queue
+import threading
 from datetime import datetime
-import pandas as pd
 import os
+from database import BILLING_DB, fetch_one, transaction
+from ledger_export import ExportCancelled, export_ledger, fetch_ledger_page, ledger_filters, page_key
+from migrations import ensure_schema
+
+PAGE_SIZE = 200     # ledger rows fetched per page
+PREFETCH_AT = 0.9   # fetch the next page once the scrollbar passes this point
+EXPORT_POLL_MS = 100  # how often the export progress bar is updated
 
 class LedgerView:
     def __init__(self, window):
@@ -29,6 +37,16 @@ class LedgerView:
 
         # Filter variables
         self.type_filter = tk.StringVar(value="All")
+
+        # Paging state; see load_ledger
+        self.filter_conds, self.filter_params = [], []
+        self.last_key = None
+        self.exhausted = True
+        self.page_pending = False
+        self.loaded = self.total_count = 0
+        self.total_value = 0.0
+        self.sort_column, self.sort_descending = "Date", True
+        self.export_thread = None
         
         # Build UI
         self.create_widgets()
@@ -70,7 +88,7 @@ class LedgerView:
         # Type
         ttk.Label(df, text="Type:").grid(row=0, column=4, padx=(10,5))
         self.type_combo = ttk.Combobox(df, textvariable=self.type_filter,
-                                       values=["All","Purchase","Sale"], width=10)
+                                       values=["All","Purchase","Sale","Adjustment"], width=10)
         self.type_combo.grid(row=0, column=5, padx=5)
         self.type_combo.current(0)
 
@@ -91,68 +109,69 @@ class LedgerView:
             self.tree.heading(col, text=col, command=lambda _c=col: self.sort_treeview(_c))
             self.tree.column(col, width=w, anchor=tk.CENTER)
 
-        vsb = ttk.Scrollbar(treef, orient="vertical",   command=self.tree.yview)
+        self.vsb = ttk.Scrollbar(treef, orient="vertical", command=self.tree.yview)
         hsb = ttk.Scrollbar(treef, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll, xscrollcommand=hsb.set)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        vsb.pack(side=tk.RIGHT, fill=tk.Y)
+        self.vsb.pack(side=tk.RIGHT, fill=tk.Y)
         hsb.pack(side=tk.BOTTOM, fill=tk.X)
 
         self.tree.bind("<Double-1>", self.on_item_double_click)
 
     def load_ledger(self, start_date=None, end_date=None, transaction_type=None):
+        """Reset the view to the given filters and load the first page"""
         # Treat empty strings as None
         if start_date == "": start_date = None
         if end_date   == "": end_date   = None
 
-        # Clear existing rows
-        for iid in self.tree.get_children():
-            self.tree.delete(iid)
+        conds, params = ledger_filters(start_date, end_date, transaction_type)
+        self.filter_conds, self.filter_params = conds, params
 
         try:
-            conn = sqlite3.connect('db/billing.db')
-            c    = conn.cursor()
-
-            query  = "SELECT id, date, type, item_name, quantity, price FROM ledger"
-            params = []
-            conds  = []
-
-            if start_date:
-                conds.append("date(date) >= date(?)")
-                params.append(start_date)
-            if end_date:
-                conds.append("date(date) <= date(?)")
-                params.append(end_date)
-            if transaction_type and transaction_type != "All":
-                conds.append("type = ?")
-                params.append(transaction_type)
-
-            if conds:
-                query += " WHERE " + " AND ".join(conds)
-            query += " ORDER BY date DESC"
-
-            c.execute(query, params)
-            rows = c.fetchall()
-            conn.close()
-
-            for row in rows:
-                id_, date_, typ, item, qty, price = row
-
-                # Guard against NULL in DB
-                qty   = qty   if qty   is not None else 0
-                price = price if price is not None else 0.0
-                total = qty * price
-
-                self.tree.insert("", "end", values=(
-                    id_, date_, typ, item, qty,
-                    f"₹{price:.2f}", f"₹{total:.2f}"
-                ))
-
-            self.update_status(f"Showing {len(rows)} transactions")
-
+            where = " WHERE " + " AND ".join(conds) if conds else ""
+            self.total_count, self.total_value = fetch_one(f"""
+                SELECT COUNT(*), COALESCE(SUM(COALESCE(quantity, 0) * COALESCE(price, 0)), 0)
+                FROM ledger{where}
+            """, params, db_path=BILLING_DB)
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Error: {e}")
             self.update_status("Error loading data")
+            return
+        self.reload_pages()
+
+    def load_next_page(self):
+        """Append the next PAGE_SIZE rows after the last one shown, in the current sort"""
+        if self.exhausted:
+            return
+        rows = fetch_ledger_page(self.filter_conds, self.filter_params, self.sort_column,
+                                 self.sort_descending, self.last_key, PAGE_SIZE, BILLING_DB)
+
+        for id_, date_, typ, item, qty, price, total, _key in rows:
+            self.tree.insert("", "end", values=(
+                id_, date_, typ, item, qty,
+                f"₹{price:.2f}", f"₹{total:.2f}"
+            ))
+        if rows:
+            self.last_key = page_key(rows[-1])
+        self.loaded += len(rows)
+        self.exhausted = len(rows) < PAGE_SIZE
+        self.update_status(f"Showing {self.loaded} of {self.total_count} transactions "
+                           f"(total ₹{self.total_value:.2f})")
+
+    def on_tree_scroll(self, first, last):
+        """Scrollbar callback; fetch the next page as the view nears the end"""
+        self.vsb.set(first, last)
+        if float(last) >= PREFETCH_AT and not self.exhausted and not self.page_pending:
+            self.page_pending = True
+            self.window.after_idle(self.load_pending_page)
+
+    def load_pending_page(self):
+        self.page_pending = False
+        try:
+            self.load_next_page()
+        except sqlite3.Error as e:
+            self.exhausted = True
+            messagebox.showerror("Database Error", f"Error: {e}")
 
     def apply_filter(self):
         sd = self.start_date_var.get()
@@ -200,11 +219,9 @@ class LedgerView:
         win.grab_set()
 
         try:
-            conn = sqlite3.connect('db/billing.db')
-            c    = conn.cursor()
-            c.execute("SELECT * FROM ledger WHERE id = ?", (transaction_id,))
-            txn = c.fetchone()
-            conn.close()
+            txn = fetch_one(
+                "SELECT id, date, type, item_name, quantity, price, notes FROM ledger WHERE id = ?",
+                (transaction_id,), db_path=BILLING_DB)
 
             if not txn:
                 ttk.Label(win, text="Not found").pack(pady=20)
@@ -226,11 +243,12 @@ class LedgerView:
             ttk.Label(win, text=f"Error: {e}").pack(pady=20)
 
     def export_to_excel(self):
-    # Gather data
-        data = [self.tree.item(i)['values'] for i in self.tree.get_children()]
-        df   = pd.DataFrame(data, columns=["ID","Date","Type","Item","Quantity","Price","Total"])
+        """Stream the filtered ledger to ~/Downloads on a worker thread"""
+        if self.export_thread and self.export_thread.is_alive():
+            messagebox.showinfo("Export Running", "An export is already in progress")
+            return
 
-    # Build a cross-platform Downloads path
+        # Build a cross-platform Downloads path
         user_home = os.path.expanduser("~")
         downloads = os.path.join(user_home, "Downloads")
         os.makedirs(downloads, exist_ok=True)
@@ -240,26 +258,86 @@ class LedgerView:
             f"ledger_{datetime.now():%Y%m%d_%H%M%S}.xlsx"
         )
 
-        try:
-            # Try Excel first
-            df.to_excel(filename, index=False, engine='xlsxwriter')
-            messagebox.showinfo("Exported", f"Ledger saved to:\n{filename}")
-            self.update_status(f"Exported to {filename}")
-        except ImportError:
-            # Fallback to CSV
-            csv_name = filename.replace('.xlsx', '.csv')
-            df.to_csv(csv_name, index=False)
-            messagebox.showinfo("Exported as CSV", f"Ledger saved to:\n{csv_name}")
-            self.update_status(f"Exported to {csv_name}")
+        # Progress window
+        win = tk.Toplevel(self.window)
+        win.title("Exporting Ledger")
+        win.resizable(False, False)
+        win.transient(self.window)
+        progress_var = tk.StringVar(value="Starting export...")
+        ttk.Label(win, textvariable=progress_var).pack(padx=20, pady=(20, 5))
+        bar = ttk.Progressbar(win, length=300, maximum=max(self.total_count, 1))
+        bar.pack(padx=20, pady=5)
+        cancel = threading.Event()
+        ttk.Button(win, text="Cancel", command=cancel.set).pack(pady=(5, 20))
+        win.protocol("WM_DELETE_WINDOW", cancel.set)
+
+        results = queue.Queue()
+        sort_column, sort_descending = self.sort_column, self.sort_descending
+
+        def worker():
+            try:
+                outcome = export_ledger(filename, self.filter_conds, self.filter_params,
+                                        BILLING_DB, progress=lambda n: results.put(("progress", n)),
+                                        cancel=cancel, sort=sort_column,
+                                        descending=sort_descending)
+                results.put(("done", outcome))
+            except ExportCancelled:
+                results.put(("cancelled", None))
+            except Exception as e:
+                results.put(("error", e))
+
+        def poll():
+            while True:
+                try:
+                    kind, value = results.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    bar["value"] = value
+                    progress_var.set(f"Exported {value} of {self.total_count} rows")
+                    continue
+                win.destroy()
+                if kind == "done":
+                    saved, rows = value
+                    title = "Exported" if saved.endswith(".xlsx") else "Exported as CSV"
+                    messagebox.showinfo(title, f"{rows} rows saved to:\n{saved}")
+                    self.update_status(f"Exported to {saved}")
+                elif kind == "cancelled":
+                    self.update_status("Export cancelled")
+                else:
+                    messagebox.showerror("Export Error", f"Export failed: {value}")
+                    self.update_status("Export failed")
+                return
+            win.after(EXPORT_POLL_MS, poll)
+
+        self.export_thread = threading.Thread(target=worker, daemon=True)
+        self.export_thread.start()
+        win.after(EXPORT_POLL_MS, poll)
+        self.update_status("Exporting...")
 
     def sort_treeview(self, col):
-        data    = [(self.tree.set(iid, col), iid) for iid in self.tree.get_children('')]
-        reverse = self.tree.heading(col, "text").startswith("▲")
-        data.sort(reverse=reverse)
-        for idx, (_v, iid) in enumerate(data):
-            self.tree.move(iid, '', idx)
-        arrow = "▼" if reverse else "▲"
+        """Re-query in the column's typed order; a second click reverses it"""
+        if col == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column, self.sort_descending = col, False
+        for heading in self.tree["columns"]:
+            self.tree.heading(heading, text=heading)
+        arrow = "▼" if self.sort_descending else "▲"
         self.tree.heading(col, text=f"{arrow} {col}")
+        self.reload_pages()
+
+    def reload_pages(self):
+        """Drop the loaded rows and start again from the first page"""
+        self.tree.delete(*self.tree.get_children())
+        self.last_key = None
+        self.exhausted = False
+        self.loaded = 0
+        try:
+            self.load_next_page()
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Error: {e}")
+            self.update_status("Error loading data")
 
     def update_status(self, message):
         self.status_var.set(message)
@@ -267,35 +345,22 @@ class LedgerView:
 
 if __name__ == "__main__":
     # Ensure database/table exists
-    conn = sqlite3.connect('db/billing.db')
-    c    = conn.cursor()
-    c.execute('''
-      CREATE TABLE IF NOT EXISTS ledger (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date TEXT    NOT NULL,
-        type TEXT    NOT NULL,
-        item_name TEXT NOT NULL,
-        quantity REAL NOT NULL,
-        price    REAL NOT NULL,
-        notes    TEXT
-      )
-    ''')
-    c.execute("SELECT COUNT(*) FROM ledger")
-    if c.fetchone()[0] == 0:
-        sample_data = [
-            ('2025-05-01','Purchase','Laptop',2,45000.00,'HP ProBook'),
-            ('2025-05-01','Sale','Monitor',3,12000.00,'LG 24-inch'),
-            ('2025-05-02','Purchase','Keyboard',5,1500.00,'Logitech'),
-            ('2025-05-03','Sale','Mouse',10,600.00,'Wireless'),
-            ('2025-05-04','Purchase','Headphones',4,2000.00,'Sony'),
-            ('2025-05-05','Sale','Printer',1,18000.00,'HP LaserJet'),
-        ]
-        c.executemany('''
-          INSERT INTO ledger (date,type,item_name,quantity,price,notes)
-          VALUES (?,?,?,?,?,?)
-        ''', sample_data)
-    conn.commit()
-    conn.close()
+    ensure_schema(BILLING_DB)
+    with transaction(BILLING_DB) as c:
+        c.execute("SELECT COUNT(*) FROM ledger")
+        if c.fetchone()[0] == 0:
+            sample_data = [
+                ('2025-05-01','Purchase','Laptop',2,45000.00,'HP ProBook'),
+                ('2025-05-01','Sale','Monitor',3,12000.00,'LG 24-inch'),
+                ('2025-05-02','Purchase','Keyboard',5,1500.00,'Logitech'),
+                ('2025-05-03','Sale','Mouse',10,600.00,'Wireless'),
+                ('2025-05-04','Purchase','Headphones',4,2000.00,'Sony'),
+                ('2025-05-05','Sale','Printer',1,18000.00,'HP LaserJet'),
+            ]
+            c.executemany('''
+              INSERT INTO ledger (date,type,item_name,quantity,price,notes)
+              VALUES (?,?,?,?,?,?)
+            ''', sample_data)
 
     root = tk.Tk()
     app  = LedgerView(root)
@@ -0,0 +1,203 @@
+import argparse
+import csv
+import os
+import time
+
+from database import BILLING_DB, close_thread_connections, ensure_timestamp_column, fetch_all
+
+CHUNK_SIZE = 2000  # ledger rows read from SQLite per query
+COLUMNS = ["ID", "Date", "Type", "Item", "Quantity", "Price", "Total"]
+
+# Typed sort key per LedgerView heading. NULLs are folded away so row-value
+# keyset comparisons never skip rows; each expression has a matching index
+# (see ensure_ledger_indexes).
+SORT_EXPRESSIONS = {
+    "ID": "id",
+    "Date": "COALESCE(ts, '')",
+    "Type": "COALESCE(type, '')",
+    "Item": "COALESCE(item_name, '')",
+    "Qty": "COALESCE(quantity, 0)",
+    "Price": "COALESCE(price, 0.0)",
+    "Total": "COALESCE(quantity, 0) * COALESCE(price, 0.0)",
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def ensure_ledger_indexes(cursor):
+    """ts column plus the indexes behind the ledger filters and header sorts"""
+    ensure_timestamp_column(cursor, "ledger")
+    cursor.execute("DROP INDEX IF EXISTS idx_ledger_date")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ledger_ts_type ON ledger (ts, type)")
+    for heading, expr in SORT_EXPRESSIONS.items():
+        if heading != "ID":  # served by the primary key
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_ledger_sort_{heading.lower()} "
+                           f"ON ledger ({expr})")
+
+
+def ledger_filters(start_date=None, end_date=None, transaction_type=None):
+    """WHERE conditions and parameters for the ledger filter options"""
+    conds, params = [], []
+    # Plain ranges on the normalized ts column so idx_ledger_ts_type applies
+    if start_date:
+        conds.append("ts >= ?")
+        params.append(start_date)
+    if end_date:
+        conds.append("ts < date(?, '+1 day')")
+        params.append(end_date)
+    if transaction_type and transaction_type != "All":
+        conds.append("type = ?")
+        params.append(transaction_type)
+    return conds, params
+
+
+def fetch_ledger_page(conds=(), params=(), sort="Date", descending=True, after=None,
+                      limit=CHUNK_SIZE, db_path=BILLING_DB):
+    """One keyset page of filtered ledger rows in a column's typed order.
+
+    sort is a column heading from SORT_EXPRESSIONS; ties are broken by id.
+    after is the page_key() of the last row already read. Rows are
+    (id, date, type, item, quantity, price, total, sort_key).
+    """
+    expr = SORT_EXPRESSIONS[sort]
+    direction = "DESC" if descending else "ASC"
+    op = "<" if descending else ">"
+
+    def query(extra_conds, extra_params, order, count):
+        where_conds = list(conds) + extra_conds
+        where = " WHERE " + " AND ".join(where_conds) if where_conds else ""
+        return fetch_all(f"""
+            SELECT id, date, type, item_name, COALESCE(quantity, 0), COALESCE(price, 0.0),
+                   COALESCE(quantity, 0) * COALESCE(price, 0.0), {expr}
+            FROM ledger{where}
+            ORDER BY {order}
+            LIMIT ?
+        """, list(params) + extra_params + [count], db_path=db_path)
+
+    if expr == "id":
+        if after is None:
+            return query([], [], f"id {direction}", limit)
+        return query([f"id {op} ?"], [after[1]], f"id {direction}", limit)
+
+    order = f"{expr} {direction}, id {direction}"
+    if after is None:
+        return query([], [], order, limit)
+    # Finish the run of rows sharing the last sort value, then continue past
+    # it. SQLite seeks the expression index for each of these two ranges,
+    # whereas a (value, id) row-value comparison on an expression scans it.
+    rows = query([f"{expr} = ?", f"id {op} ?"], list(after), f"id {direction}", limit)
+    if len(rows) < limit:
+        rows += query([f"{expr} {op} ?"], [after[0]], order, limit - len(rows))
+    return rows
+
+
+def page_key(row):
+    return row[7], row[0]
+
+
+def iter_ledger_chunks(conds=(), params=(), db_path=BILLING_DB, chunk_size=CHUNK_SIZE,
+                       sort="Date", descending=True):
+    """Yield matching ledger rows in sort order, chunk_size at a time.
+
+    Each chunk is its own keyset query, so no read transaction is held open
+    between chunks and the tills can keep writing meanwhile.
+    """
+    after = None
+    while True:
+        rows = fetch_ledger_page(conds, params, sort, descending, after, chunk_size, db_path)
+        if not rows:
+            return
+        after = page_key(rows[-1])
+        yield [row[:7] for row in rows]
+        if len(rows) < chunk_size:
+            return
+
+
+class XlsxWriter:
+    """Write-only openpyxl workbook; rows go straight to disk as they are added"""
+
+    def __init__(self, filename):
+        from openpyxl import Workbook
+        self.filename = filename
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Ledger")
+
+    def writerows(self, rows):
+        for row in rows:
+            self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.filename)
+
+
+class CsvWriter:
+    def __init__(self, filename):
+        self.filename = filename
+        self.handle = open(filename, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.handle)
+
+    def writerows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.handle.close()
+
+
+def open_writer(filename):
+    """XLSX writer for .xlsx names, falling back to CSV without openpyxl"""
+    if filename.endswith(".xlsx"):
+        try:
+            return XlsxWriter(filename)
+        except ImportError:
+            filename = filename[:-len(".xlsx")] + ".csv"
+    return CsvWriter(filename)
+
+
+def export_ledger(filename, conds=(), params=(), db_path=BILLING_DB,
+                  progress=None, cancel=None, chunk_size=CHUNK_SIZE,
+                  sort="Date", descending=True):
+    """Stream the filtered ledger to filename and return (filename, rows).
+
+    Rows follow the given sort (see SORT_EXPRESSIONS). Quantity, price and
+    total are written as numbers. progress(rows) is called after each
+    chunk; if the cancel event is set the partial file is removed and
+    ExportCancelled raised.
+    """
+    writer = open_writer(filename)
+    written = 0
+    try:
+        writer.writerows([COLUMNS])
+        for rows in iter_ledger_chunks(conds, params, db_path, chunk_size, sort, descending):
+            if cancel is not None and cancel.is_set():
+                raise ExportCancelled()
+            writer.writerows(rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+        writer.close()
+    except BaseException:
+        writer.close()
+        if os.path.exists(writer.filename):
+            os.remove(writer.filename)
+        raise
+    finally:
+        close_thread_connections()
+    return writer.filename, written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the ledger to XLSX or CSV")
+    parser.add_argument("out", help="output file, .xlsx or .csv")
+    parser.add_argument("--db", default=BILLING_DB)
+    parser.add_argument("--from-date", help="YYYY-MM-DD")
+    parser.add_argument("--to-date", help="YYYY-MM-DD (inclusive)")
+    parser.add_argument("--type", help="Purchase, Sale or Adjustment")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    _filename, _rows = export_ledger(
+        args.out, *ledger_filters(args.from_date, args.to_date, args.type), db_path=args.db)
+    elapsed = time.perf_counter() - start
+    print(f"Exported {_rows} rows to {_filename} in {elapsed:.2f}s ({_rows / elapsed:.0f} rows/sec)")
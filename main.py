@@ -1,11 +1,22 @@
+import argparse
+import importlib
+import os
+import threading
+import time
 import tkinter as tk
-from tkinter import ttk
-from ledger import LedgerView
-from restock import RestockManager
-from add_items import AddItems
-from pos_gui import PosApp
-from inventory_editor import InventoryEditor
-import sqlite3
+from tkinter import ttk, messagebox
+from database import BILLING_DB
+from migrations import ensure_schema
+
+# Windows are imported when first opened; they pull in cv2, pyzbar, PIL and
+# ReportLab. After the menu is up these are imported on a background thread
+# so the first click is quick too. Set POS_PREWARM=0 to turn that off.
+PREWARM = os.environ.get("POS_PREWARM", "1") != "0"
+PREWARM_DELAY_MS = 500
+PREWARM_MODULES = [
+    "pos_gui", "restock", "add_items", "inventory_editor", "ledger", "dashboard",
+    "cv2", "pyzbar.pyzbar", "PIL.ImageTk", "reportlab.pdfgen.canvas",
+]
 
 class MainApp:
     def __init__(self, root):
@@ -14,30 +25,13 @@ class MainApp:
         self.root.geometry("1000x750")
         self.init_db()
         self.create_menu()
+        if PREWARM:
+            self.root.after(PREWARM_DELAY_MS, self.start_prewarm)
     
     def init_db(self):
-        conn = sqlite3.connect('db/billing.db')
-        c = conn.cursor()
-        
-        # Create tables if not exists
-        c.execute('''CREATE TABLE IF NOT EXISTS items
-                    (id INTEGER PRIMARY KEY,
-                     barcode TEXT UNIQUE,
-                     name TEXT,
-                     price REAL,
-                     quantity INTEGER)''')
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS ledger
-                    (id INTEGER PRIMARY KEY,
-                     date TEXT,
-                     type TEXT,
-                     item_id INTEGER,
-                     item_name TEXT,
-                     quantity INTEGER,
-                     price REAL)''')
-        
-        conn.commit()
-        conn.close()
+        """Apply any pending schema migrations (once per process)"""
+        for warning in ensure_schema(BILLING_DB):
+            messagebox.showwarning("Database", warning)
     
     def create_menu(self):
         main_frame = ttk.Frame(self.root)
@@ -48,7 +42,8 @@ class MainApp:
             ("Add Items", self.open_add_items),
             ("Inventory Editor", self.open_inventory_editor),
             ("Ledger", self.open_ledger),
-            ("Restock", self.open_restock)
+            ("Restock", self.open_restock),
+            ("Sales Dashboard", self.open_dashboard)
         ]
         
         for text, command in buttons:
@@ -56,27 +51,67 @@ class MainApp:
                             width=25, padding=15)
             btn.pack(pady=15)
     
+    def start_prewarm(self):
+        threading.Thread(target=prewarm, daemon=True).start()
+
     def open_ledger(self):
+        from ledger import LedgerView
         ledger_window = tk.Toplevel(self.root)
         LedgerView(ledger_window)
     
     def open_restock(self):
+        from restock import RestockManager
         restock_window = tk.Toplevel(self.root)
         RestockManager(restock_window)
     
     def open_add_items(self):
+        from add_items import AddItems
         add_window = tk.Toplevel(self.root)
         AddItems(add_window)
     
     def open_pos(self):
+        from pos_gui import PosApp
         add_window = tk.Toplevel(self.root)
         PosApp(add_window)
     
     def open_inventory_editor(self):
+        from inventory_editor import InventoryEditor
         add_window = tk.Toplevel(self.root)
         InventoryEditor(add_window)
 
+    def open_dashboard(self):
+        from dashboard import SalesDashboard
+        dashboard_window = tk.Toplevel(self.root)
+        SalesDashboard(dashboard_window)
+
+
+def prewarm():
+    """Import the heavy modules and load the catalog ahead of first use"""
+    for name in PREWARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass  # Missing optional dependency; the window reports it when opened
+    try:
+        from catalog_index import get_catalog
+        get_catalog(BILLING_DB).ensure_loaded()
+    except Exception:
+        pass
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inventory Management System")
+    parser.add_argument("--startup-probe", action="store_true",
+                        help="print seconds to first window, then exit (see startup_bench.py)")
+    args = parser.parse_args()
+
     root = tk.Tk()
     app = MainApp(root)
-    root.mainloop()
\ No newline at end of file
+    if args.startup_probe:
+        # POS_STARTUP_T0 is the launcher's time.time() before starting us
+        root.update()
+        t0 = float(os.environ.get("POS_STARTUP_T0", time.time()))
+        print(f"first_window {time.time() - t0:.3f}", flush=True)
+        root.destroy()
+    else:
+        root.mainloop()
\ No newline at end of file
@@ -0,0 +1,248 @@
+import argparse
+import os
+import threading
+
+from database import BILLING_DB, ensure_timestamp_column, fetch_all, fetch_one, transaction
+from invoice_numbers import ensure_invoice_tables
+from item_search import ensure_name_index
+from journal import ensure_journal
+from ledger_export import ensure_ledger_indexes
+from sales_summary import ensure_summary_tables
+
+
+def add_missing_columns(cursor, table, columns):
+    """ALTER TABLE for each (name, type) that an older schema lacks"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {column[1] for column in cursor.fetchall()}
+    for name, column_type in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+
+def create_base_schema(cursor, _db_path):
+    """items, sales, sale_items, settings and ledger in their common shape.
+
+    Older databases created by the individual windows keep their tables;
+    missing columns are added so every copy converges on this schema.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            barcode TEXT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            total REAL NOT NULL,
+            invoice_number TEXT NOT NULL,
+            table_number INTEGER
+        )
+    """)
+    add_missing_columns(cursor, "sales", [("invoice_number", "TEXT"), ("table_number", "INTEGER")])
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sale_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            FOREIGN KEY (sale_id) REFERENCES sales(id),
+            FOREIGN KEY (item_id) REFERENCES items(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sale_items_sale
+        ON sale_items (sale_id, item_id)
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('last_invoice_number', '10000')")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            type TEXT NOT NULL,
+            item_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER,
+            price REAL,
+            notes TEXT
+        )
+    """)
+    add_missing_columns(cursor, "ledger", [("item_id", "INTEGER"), ("notes", "TEXT")])
+
+    # Tables created by the old POS window had no unique barcode
+    cursor.execute("PRAGMA index_list(items)")
+    for _seq, index_name, unique, *_rest in cursor.fetchall():
+        if unique and [info[2] for info in
+                       cursor.execute(f"PRAGMA index_info({index_name})").fetchall()] == ["barcode"]:
+            return
+    cursor.execute("""
+        SELECT 1 FROM items WHERE barcode IS NOT NULL
+        GROUP BY barcode HAVING COUNT(*) > 1 LIMIT 1
+    """)
+    if cursor.fetchone():
+        return ("Some items share a barcode, so barcodes cannot be made unique until "
+                "they are corrected. Run 'python migrations.py --reapply' afterwards.")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_items_barcode ON items (barcode)")
+
+
+def add_timestamps(cursor, _db_path):
+    """Normalized ts columns plus the ledger filter/sort and sales date indexes"""
+    ensure_ledger_indexes(cursor)
+    ensure_timestamp_column(cursor, "sales")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_ts ON sales (ts)")
+
+
+def add_name_search(cursor, _db_path):
+    ensure_name_index(cursor)
+
+
+def add_invoice_numbering(cursor, _db_path):
+    if not ensure_invoice_tables(cursor):
+        return ("Existing sales share invoice numbers, so uniqueness cannot be "
+                "enforced until they are corrected. Run 'python migrations.py "
+                "--reapply' afterwards.")
+
+
+def add_sales_summaries(cursor, _db_path):
+    ensure_summary_tables(cursor)
+
+
+def merge_pos_db(cursor, db_path):
+    """Copy items that only exist in the old db/pos.db next to db_path.
+
+    Add Items used to write to pos.db while the POS sold from billing.db.
+    Items already in billing.db keep their billing.db stock and price,
+    since that is what sales have been decrementing. pos.db is left in
+    place untouched.
+    """
+    pos_db = os.path.join(os.path.dirname(db_path), "pos.db")
+    if os.path.abspath(pos_db) == os.path.abspath(db_path) or not os.path.isfile(pos_db):
+        return
+    if not fetch_one("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items'",
+                     db_path=pos_db):
+        return
+    rows = fetch_all("SELECT barcode, name, price, quantity FROM items", db_path=pos_db)
+    cursor.executemany("""
+        INSERT INTO items (barcode, name, price, quantity)
+        SELECT ?1, ?2, ?3, ?4
+        WHERE NOT EXISTS (SELECT 1 FROM items WHERE barcode = ?1)
+    """, rows)
+
+
+def add_item_versions(cursor, _db_path):
+    """items.version, bumped by a trigger on every change to an item.
+
+    Editors remember the version they loaded and update with
+    WHERE version = ?, so a concurrent sale or restock is detected
+    instead of overwritten.
+    """
+    add_missing_columns(cursor, "items", [("version", "INTEGER NOT NULL DEFAULT 0")])
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS items_version_au
+        AFTER UPDATE OF barcode, name, price, quantity ON items
+        WHEN NEW.version = OLD.version BEGIN
+            UPDATE items SET version = OLD.version + 1 WHERE id = NEW.id;
+        END
+    """)
+
+
+def add_journal(cursor, _db_path):
+    ensure_journal(cursor)
+
+
+def ledger_ts_from_journal(cursor, _db_path):
+    # Recreate journal_ledger_ai so it writes ledger.ts itself
+    cursor.execute("DROP TRIGGER IF EXISTS journal_ledger_ai")
+    ensure_journal(cursor)
+
+
+def add_ledger_sort_indexes(cursor, _db_path):
+    # The Date sort key became COALESCE(ts, ''), which needs its own index
+    ensure_ledger_indexes(cursor)
+
+
+# (version, description, step); step(cursor, db_path) may return a warning
+# for the user. Never edit or reorder released steps: append new ones.
+MIGRATIONS = [
+    (1, "base schema", create_base_schema),
+    (2, "normalized timestamps and ledger indexes", add_timestamps),
+    (3, "item name search index", add_name_search),
+    (4, "invoice number blocks", add_invoice_numbering),
+    (5, "sales summaries", add_sales_summaries),
+    (6, "merge items from pos.db", merge_pos_db),
+    (7, "item row versions", add_item_versions),
+    (8, "stock journal", add_journal),
+    (9, "journal writes ledger timestamps", ledger_ts_from_journal),
+    (10, "ledger date sort index", add_ledger_sort_indexes),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_migrated = set()
+_migrated_lock = threading.Lock()
+
+
+def schema_version(db_path=BILLING_DB):
+    return fetch_one("PRAGMA user_version", db_path=db_path)[0]
+
+
+def migrate(db_path=BILLING_DB, reapply=False):
+    """Bring db_path up to LATEST_VERSION and return any warnings.
+
+    Each pending step runs in its own transaction together with the
+    PRAGMA user_version bump, so an interrupted upgrade resumes where it
+    stopped. reapply re-runs every step; they are all idempotent.
+    """
+    warnings = []
+    for version, _description, step in MIGRATIONS:
+        with transaction(db_path) as cursor:
+            # Re-read under the write lock; another process may have migrated
+            cursor.execute("PRAGMA user_version")
+            current = cursor.fetchone()[0]
+            if version <= current and not reapply:
+                continue
+            warning = step(cursor, db_path)
+            if warning:
+                warnings.append(warning)
+            if version > current:
+                cursor.execute(f"PRAGMA user_version = {version}")
+    return warnings
+
+
+def ensure_schema(db_path=BILLING_DB):
+    """Migrate db_path once per process; later calls return straight away.
+
+    Returns the warnings from the first call (an empty list afterwards, so
+    they are shown once).
+    """
+    with _migrated_lock:
+        if db_path in _migrated:
+            return []
+        warnings = []
+        if schema_version(db_path) < LATEST_VERSION:
+            warnings = migrate(db_path)
+        _migrated.add(db_path)
+        return warnings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--db", default=BILLING_DB)
+    parser.add_argument("--reapply", action="store_true",
+                        help="re-run every step, e.g. after fixing duplicate data")
+    args = parser.parse_args()
+
+    before = schema_version(args.db)
+    for _warning in migrate(args.db, args.reapply):
+        print(f"Warning: {_warning}")
+    print(f"{args.db}: schema version {before} -> {schema_version(args.db)}")
@@ -1,90 +1,99 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from PIL import Image, ImageTk
+import concurrent.futures
 import datetime
 import sqlite3
 import os
-import subprocess
-import cv2
-from pyzbar.pyzbar import decode
 import threading
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-
-DB_PATH = "db/billing.db"
-cart = []
-scanner_active = False
+import queue
+from barcode_scanner import BarcodeScanner
+from catalog_index import get_catalog
+from database import BILLING_DB, close_thread_connections, get_connection
+from item_search import search_names, uses_trigram
+from migrations import ensure_schema
+from sales import record_sale
+from invoice_numbers import get_allocator
+from journal import WRITE_TIMEOUT, get_writer
+from print_spooler import get_spooler
+
+DB_PATH = BILLING_DB
+SEARCH_DEBOUNCE_MS = 150   # wait for typing to pause before searching
+SEARCH_POLL_MS = 30        # how often to check for background search results
+SEARCH_LIMIT = 50          # max rows shown in the search results list
+PRINT_POLL_MS = 200        # how often to check for finished print jobs
+SCAN_TICK_MS = 50          # scanned items are applied to the cart once per tick
 
 class PosApp:
     def __init__(self, root):
         self.root = root
-        self.cart = []
+        self.cart = {}          # item id -> cart line, in the order scanned
+        self.cart_total = 0.0   # running totals, kept in step with the rows
+        self.cart_qty = 0
         self.scanner_active = False
-        
-        # Initialize database
-        self.init_db()
+        self.scan_queue = queue.Queue()   # items from the scanner thread
+
+        # Search-as-you-type state
+        self.search_after_id = None
+        self.search_generation = 0
+        self.search_conn = None
+        self.search_lock = threading.Lock()
+        self.search_queue = queue.Queue()
+        self.search_requests = queue.Queue()
+
+        # With POS_SERVICE set, lookups, searches and checkouts go to the
+        # shop's service process instead of this till opening the database
+        self.service = self.connect_service()
+
+        if self.service is None:
+            # Initialize database
+            self.init_db()
+
+            # Invoice numbers come from this terminal's reserved block
+            self.invoices = get_allocator(DB_PATH)
+
+            # Catalog index is process-wide; only the first window pays for the load
+            self.catalog = get_catalog(DB_PATH)
+            self.catalog.ensure_loaded()
         
         # Setup UI
         self.setup_gui()
+
+        # One long-lived search worker per window, so its connection is reused
+        if self.service is None:
+            threading.Thread(target=self.search_worker, daemon=True).start()
+
+        # The sale just saved, so the receipt need not be read back
+        self.last_sale = None
+
+        # Receipts go through the shared print spooler; outcomes come back here
+        self.print_results = queue.Queue()
+        self.print_pending = 0
+
+        self.root.bind("<Destroy>", self.on_destroy, add="+")
+
+    def on_destroy(self, event):
+        if event.widget is self.root:
+            self.search_requests.put(None)
+            if self.service:
+                self.service.close()
+
+    def connect_service(self):
+        """Client for the POS service named by POS_SERVICE, or None to use the database"""
+        if not os.environ.get("POS_SERVICE"):
+            return None
+        from pos_service import client_from_env
+        try:
+            return client_from_env()
+        except (OSError, ValueError) as e:
+            messagebox.showwarning("POS Service",
+                                   f"Could not reach the POS service ({e}); using the database directly.")
+            return None
         
     def init_db(self):
-        """Initialize the database and create necessary tables"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Create settings table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        """)
-        
-        # Create sales table with table_number
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sales (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                total REAL NOT NULL,
-                invoice_number TEXT NOT NULL,
-                table_number INTEGER
-            )
-        """)
-        
-        # Create sale_items table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sale_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sale_id INTEGER NOT NULL,
-                item_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL,
-                price REAL NOT NULL,
-                FOREIGN KEY (sale_id) REFERENCES sales(id)
-            )
-        """)
-        
-        # Create items table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL NOT NULL,
-                quantity INTEGER DEFAULT 0,
-                barcode TEXT
-            )
-        """)
-        
-        cursor.execute("SELECT value FROM settings WHERE key = 'last_invoice_number'")
-        if not cursor.fetchone():
-            cursor.execute("INSERT INTO settings (key, value) VALUES ('last_invoice_number', '10000')")
-            
-        cursor.execute("PRAGMA table_info(sales)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if 'invoice_number' not in columns:
-            cursor.execute("ALTER TABLE sales ADD COLUMN invoice_number TEXT")
-            
-        conn.commit()
-        conn.close()
+        """Make sure the schema is current; a no-op after the first window"""
+        for warning in ensure_schema(DB_PATH):
+            messagebox.showwarning("Database", warning)
+        self.search_trigram = uses_trigram(get_connection(DB_PATH))
 
     def setup_gui(self):
         """Set up the GUI components"""
@@ -104,6 +113,7 @@ class PosApp:
         
         # Logo and store info
         try:
+            from PIL import Image, ImageTk
             logo_img = Image.open("logo.png").resize((80, 80))
             self.logo_photo = ImageTk.PhotoImage(logo_img)
             self.logo_label = tk.Label(self.header, image=self.logo_photo, bg="white")
@@ -137,11 +147,14 @@ class PosApp:
         tk.Label(self.search_frame, text="Search Item:", bg="white", font=("Arial", 14)).pack(side=tk.LEFT)
         self.search_entry = tk.Entry(self.search_frame, font=("Arial", 14), width=25, bd=2, relief=tk.GROOVE)
         self.search_entry.pack(side=tk.LEFT, padx=5)
-        self.search_entry.bind("<KeyRelease>", self.search_items)
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
 
         self.scan_btn = tk.Button(self.search_frame, text="📷 Scan", font=("Arial", 12), 
                             command=self.start_barcode_scan, bg="#4DB6AC", fg="white")
         self.scan_btn.pack(side=tk.LEFT, padx=5)
+        self.continuous_scan = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.search_frame, text="Continuous", variable=self.continuous_scan,
+                       bg="white", font=("Arial", 11)).pack(side=tk.LEFT)
 
         # Search Results
         self.search_results = tk.Listbox(self.left_panel, height=5, font=("Arial", 12))
@@ -196,6 +209,11 @@ class PosApp:
         self.total_label = tk.Label(self.totals_frame, text="₹0.00", bg="#e0e0e0", font=("Arial", 18, "bold"), fg="green")
         self.total_label.pack(anchor=tk.W)
 
+        # Background job status (PDF rendering, printing)
+        self.status_var = tk.StringVar()
+        tk.Label(self.right_panel, textvariable=self.status_var, bg="#e0e0e0", font=("Arial", 10),
+                 wraplength=220, justify=tk.LEFT).pack(side=tk.BOTTOM, anchor=tk.W, padx=10, pady=10)
+
     def process_barcode_entry(self, event=None):
         """Process barcode entry when Enter key is pressed"""
         barcode = self.barcode_entry.get().strip()
@@ -209,71 +227,156 @@ class PosApp:
 
     def start_barcode_scan(self):
         """Start barcode scanning in a separate thread"""
+        if self.scanner_active:
+            return
         self.scanner_active = True
-        scan_thread = threading.Thread(target=self.scan_barcode, daemon=True)
-        scan_thread.start()
-
-    def scan_barcode(self):
-        """Scan barcode using camera"""
-        cap = cv2.VideoCapture(0)
-        while self.scanner_active:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            decoded_objects = decode(frame)
-            if decoded_objects:
-                barcode = decoded_objects[0].data.decode('utf-8')
-                item = self.lookup_item(barcode)
-                if item:
-                    self.add_scanned_item(item)
-                    self.scanner_active = False
-                    break
-                    
-            cv2.imshow('Barcode Scanner', frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                self.scanner_active = False
-                break
-                
-        cap.release()
-        cv2.destroyAllWindows()
+        title = 'Barcode Scanner - Continuous (Press q to stop)' if self.continuous_scan.get() \
+            else 'Barcode Scanner'
+        self.scanner = BarcodeScanner(self.scan_barcode, on_finish=self.on_scan_finished,
+                                      continuous=self.continuous_scan.get(), window_title=title)
+        self.scanner.start()
+        self.root.after(SCAN_TICK_MS, self.drain_scan_queue)
+
+    def scan_barcode(self, barcode):
+        """Scanner callback: add the item, or keep scanning if the code is unknown"""
+        item = self.lookup_item(barcode)
+        if not item:
+            return False
+        self.add_scanned_item(item)
+
+    def on_scan_finished(self, codes):
+        self.scanner_active = False
 
     def add_scanned_item(self, item):
-        """Add scanned item to cart"""
-        for cart_item in self.cart:
-            if cart_item['id'] == item[0]:
-                cart_item['qty'] += 1
-                cart_item['subtotal'] = cart_item['qty'] * cart_item['price']
+        """Add scanned item to cart; safe to call from any thread"""
+        self.scan_queue.put(item)
+
+    def drain_scan_queue(self):
+        """Apply every item scanned since the last tick as one cart update"""
+        counts = {}
+        while True:
+            try:
+                item = self.scan_queue.get_nowait()
+            except queue.Empty:
                 break
-        else:
-            self.cart.append({
-                'id': item[0],
-                'name': item[1],
-                'price': item[2],
-                'qty': 1,
-                'subtotal': item[2]
-            })
-        self.update_cart_display()
+            if item[0] in counts:
+                counts[item[0]][1] += 1
+            else:
+                counts[item[0]] = [item, 1]
+
+        for item, qty in counts.values():
+            self.add_to_cart(item, qty, refresh_totals=False)
+        if counts:
+            self.update_totals()
+
+        if self.scanner_active or not self.scan_queue.empty():
+            self.root.after(SCAN_TICK_MS, self.drain_scan_queue)
+
+    def on_search_key(self, event=None):
+        """Debounce keystrokes so a search only runs once typing pauses"""
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.search_items)
 
     def search_items(self, event=None):
         """Search items by name, id or barcode"""
+        self.search_after_id = None
         search_term = self.search_entry.get().strip()
-        self.search_results.delete(0, tk.END)
-        self.search_results.items = []  # Reset stored items
-        
+
+        # A newer search supersedes whatever is still running
+        self.search_generation += 1
+        generation = self.search_generation
+        self.cancel_running_search()
+
         if not search_term:
+            self.show_search_results([])
             return
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, name, price FROM items 
-            WHERE name LIKE ? OR id LIKE ? OR barcode = ?
-        """, (f'%{search_term}%', f'%{search_term}%', search_term))
-        
-        items = cursor.fetchall()
-        conn.close()
-        
+
+        if self.service:
+            future = self.service.submit("search", term=search_term, limit=SEARCH_LIMIT)
+            self.root.after(SEARCH_POLL_MS, self.poll_service_search, generation, future)
+            return
+
+        # Barcode, id and word-prefix hits come straight from the catalog index
+        items = self.catalog.search(search_term, limit=SEARCH_LIMIT)
+        self.show_search_results(items)
+
+        # Top up with substring matches from the FTS index in the background
+        if len(items) < SEARCH_LIMIT and any(len(w) >= 3 for w in search_term.split()):
+            self.search_requests.put((generation, search_term))
+            self.root.after(SEARCH_POLL_MS, self.poll_search_results, generation)
+
+    def search_worker(self):
+        """Worker: run FTS queries, skipping any a newer search has superseded"""
+        conn = get_connection(DB_PATH)
+        try:
+            while True:
+                request = self.search_requests.get()
+                if request is None:
+                    break
+                generation, search_term = request
+                with self.search_lock:
+                    if generation != self.search_generation:
+                        continue
+                    self.search_conn = conn
+                try:
+                    rows = search_names(conn, search_term, SEARCH_LIMIT, self.search_trigram)
+                except sqlite3.Error:
+                    # Interrupted by a newer keystroke, or the query failed
+                    rows = None
+                finally:
+                    with self.search_lock:
+                        self.search_conn = None
+                self.search_queue.put((generation, rows))
+        finally:
+            close_thread_connections()
+
+    def cancel_running_search(self):
+        """Abort the in-flight FTS query, if any"""
+        with self.search_lock:
+            if self.search_conn is not None:
+                self.search_conn.interrupt()
+
+    def poll_search_results(self, generation):
+        """Merge background results for the current search into the list"""
+        if generation != self.search_generation:
+            return
+        while True:
+            try:
+                result_generation, rows = self.search_queue.get_nowait()
+            except queue.Empty:
+                self.root.after(SEARCH_POLL_MS, self.poll_search_results, generation)
+                return
+            if result_generation == generation:
+                break
+
+        if rows:
+            items = list(self.search_results.items)
+            seen = {item[0] for item in items}
+            for row in rows:
+                if len(items) >= SEARCH_LIMIT:
+                    break
+                if row[0] not in seen:
+                    seen.add(row[0])
+                    items.append(row)
+            self.show_search_results(items)
+
+    def poll_service_search(self, generation, future):
+        """Show the service's search results once they arrive, unless superseded"""
+        if generation != self.search_generation:
+            return
+        if not future.done():
+            self.root.after(SEARCH_POLL_MS, self.poll_service_search, generation, future)
+            return
+        if future.exception() is None:
+            self.show_search_results([tuple(item) for item in future.result()])
+
+    def show_search_results(self, items):
+        """Refill the results list, skipping the redraw if nothing changed"""
+        if items == self.search_results.items:
+            return
+        self.search_results.delete(0, tk.END)
+        self.search_results.items = []  # Reset stored items
         for item in items:
             display_text = f"{item[1]} (₹{item[2]:.2f})"
             self.search_results.insert(tk.END, display_text)
@@ -290,34 +393,38 @@ class PosApp:
             item = widget.items[index]
             self.add_to_cart(item)
 
-    def add_to_cart(self, item):
+    def add_to_cart(self, item, qty=1, refresh_totals=True):
         """Add item to cart"""
-        for cart_item in self.cart:
-            if cart_item['id'] == item[0]:
-                cart_item['qty'] += 1
-                cart_item['subtotal'] = cart_item['qty'] * item[2]
-                break
+        line = self.cart.get(item[0])
+        if line:
+            line['qty'] += qty
+            line['subtotal'] = line['qty'] * line['price']
+            self.refresh_cart_row(line)
         else:
-            self.cart.append({
+            line = self.cart[item[0]] = {
                 'id': item[0],
                 'name': item[1],
                 'price': item[2],
-                'qty': 1,
-                'subtotal': item[2]
-            })
-        self.update_cart_display()
+                'qty': qty,
+                'subtotal': qty * item[2]
+            }
+            self.tree.insert("", "end", iid=str(line['id']),
+                             values=self.cart_row_values(len(self.cart), line))
+        self.cart_total += qty * line['price']
+        self.cart_qty += qty
+        if refresh_totals:
+            self.update_totals()
 
     def lookup_item(self, search_term):
         """Look up item by id, name or barcode"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, name, price FROM items 
-            WHERE barcode = ? OR name LIKE ? OR id = ?
-        """, (search_term, f'%{search_term}%', search_term))
-        item = cursor.fetchone()
-        conn.close()
-        return item
+        if self.service:
+            from pos_service import ServiceError
+            try:
+                item = self.service.call("lookup", term=search_term)
+            except (ServiceError, OSError, TimeoutError):
+                return None
+            return tuple(item) if item else None
+        return self.catalog.lookup(search_term)
 
     def update_quantity(self):
         """Update quantity of selected item"""
@@ -325,68 +432,76 @@ class PosApp:
         if not selected:
             return
         
-        # Get selected item details
-        item_values = self.tree.item(selected[0])['values']
-        
-        # Convert ID to integer
-        try:
-            item_id = int(item_values[1])
-        except ValueError:
+        # Rows are keyed by item id
+        line = self.cart.get(int(selected[0]))
+        if not line:
             messagebox.showerror("Error", "Invalid item ID in selection")
             return
 
         # Get new quantity
         new_qty = simpledialog.askinteger(
             "Update Quantity",
-            f"New quantity for {item_values[2]}:",
+            f"New quantity for {line['name']}:",
             minvalue=1,
-            initialvalue=item_values[3]
+            initialvalue=line['qty']
         )
         
         if new_qty:
-            # Update cart with proper type conversion
-            for cart_item in self.cart:
-                if cart_item['id'] == item_id:
-                    cart_item['qty'] = new_qty
-                    cart_item['subtotal'] = round(new_qty * cart_item['price'], 2)  # Ensure float handling
-                    break
-            self.update_cart_display()
+            old_subtotal = line['subtotal']
+            self.cart_qty += new_qty - line['qty']
+            line['qty'] = new_qty
+            line['subtotal'] = round(new_qty * line['price'], 2)  # Ensure float handling
+            self.cart_total += line['subtotal'] - old_subtotal
+            self.refresh_cart_row(line)
+            self.update_totals()
+
+    def cart_row_values(self, position, line):
+        return (
+            position,
+            line['id'],
+            line['name'],
+            line['qty'],
+            f"₹{line['price']:.2f}",
+            f"₹{line['subtotal']:.2f}"
+        )
 
-    def update_cart_display(self):
-        """Update cart display in treeview"""
-        # Clear existing items
-        self.tree.delete(*self.tree.get_children())
-        
-        # Repopulate with updated data
-        for i, item in enumerate(self.cart, 1):
-            self.tree.insert("", "end", values=(
-                i,
-                item['id'],
-                item['name'],
-                item['qty'],
-                f"₹{item['price']:.2f}",
-                f"₹{item['subtotal']:.2f}"
-            ))
-        
-        # Update totals
-        total = sum(item['subtotal'] for item in self.cart)
-        qty_total = sum(item['qty'] for item in self.cart)
-        self.total_label.config(text=f"₹{total:.2f}")
-        self.qty_label.config(text=f"Quantity Total: {qty_total}")
+    def refresh_cart_row(self, line):
+        """Redraw the single row belonging to a cart line"""
+        iid = str(line['id'])
+        position = self.tree.set(iid, "S.No.")
+        self.tree.item(iid, values=self.cart_row_values(position, line))
+
+    def update_totals(self):
+        """Show the running totals"""
+        self.total_label.config(text=f"₹{self.cart_total:.2f}")
+        self.qty_label.config(text=f"Quantity Total: {self.cart_qty}")
 
     def clear_selected_items(self):
         """Remove selected items from cart"""
         selected = self.tree.selection()
-        for i in selected:
-            val = self.tree.item(i)['values']
-            self.cart[:] = [item for item in self.cart if not (item['id'] == val[1])]
-            self.tree.delete(i)
-        self.update_cart_display()
+        if not selected:
+            return
+        first = min(self.tree.index(iid) for iid in selected)
+        for iid in selected:
+            line = self.cart.pop(int(iid), None)
+            if line:
+                self.cart_total -= line['subtotal']
+                self.cart_qty -= line['qty']
+            self.tree.delete(iid)
+
+        # Only rows below the first removed one need renumbering
+        for position, iid in enumerate(self.tree.get_children()[first:], first + 1):
+            self.tree.set(iid, "S.No.", position)
+        if not self.cart:
+            self.cart_total, self.cart_qty = 0.0, 0
+        self.update_totals()
 
     def clear_cart(self):
         """Clear all items from cart"""
         self.cart.clear()
-        self.update_cart_display()
+        self.tree.delete(*self.tree.get_children())
+        self.cart_total, self.cart_qty = 0.0, 0
+        self.update_totals()
 
     def save_sale(self):
         """Save the current sale to database"""
@@ -394,64 +509,26 @@ class PosApp:
             messagebox.showwarning("Empty", "Cart is empty.")
             return None
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        low_stock_items = []
-        
-        try:
-            # Get next invoice number
-            cursor.execute("SELECT value FROM settings WHERE key = 'last_invoice_number'")
-            last_number = int(cursor.fetchone()[0])
-            invoice_number = f"HYP-{last_number + 1}"
-            
-            total = sum(item['subtotal'] for item in self.cart)
-            date_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            table_number = self.table_entry.get() or None
-            
-            # Insert sale
-            cursor.execute("""
-                INSERT INTO sales (date, total, invoice_number, table_number)
-                VALUES (?, ?, ?, ?)
-            """, (date_str, total, invoice_number, table_number))
-            sale_id = cursor.lastrowid
-
-            # Process items and update stock
-            for item in self.cart:
-                # Insert sale item
-                cursor.execute("""
-                    INSERT INTO sale_items (sale_id, item_id, quantity, price)
-                    VALUES (?, ?, ?, ?)
-                """, (sale_id, item['id'], item['qty'], item['price']))
-                
-                # Update stock quantity
-                cursor.execute("""
-                    UPDATE items 
-                    SET quantity = quantity - ?
-                    WHERE id = ?
-                """, (item['qty'], item['id']))
-                
-                # Check stock level
-                cursor.execute("SELECT quantity, name FROM items WHERE id = ?", (item['id'],))
-                result = cursor.fetchone()
-                if result:
-                    stock, name = result
-                    if stock < 10:
-                        low_stock_items.append(f"{name} ({stock} remaining)")
-
-            # Update invoice number
-            cursor.execute("""
-                UPDATE settings SET value = ? WHERE key = 'last_invoice_number'
-            """, (str(last_number + 1),))
-            
-            conn.commit()
-            
-        except sqlite3.Error as e:
-            conn.rollback()
-            messagebox.showerror("Database Error", f"Failed to save sale: {str(e)}")
+        table_number = self.table_entry.get() or None
+        lines = list(self.cart.values())
+        date_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        saved = (self.checkout_via_service if self.service else self.record_sale_locally)(
+            lines, table_number, date_str)
+        if saved is None:
             return None
-        finally:
-            conn.close()
-        
+        invoice_number, low_stock = saved
+
+        low_stock_items = [f"{name} ({stock} remaining)" for name, stock in low_stock]
+
+        # Keep what was sold so receipts and PDFs need not read it back
+        self.last_sale = {
+            'invoice_number': invoice_number,
+            'date': date_str,
+            'total': sum(line['qty'] * line['price'] for line in lines),
+            'lines': [(line['name'], line['qty'], line['price']) for line in lines],
+        }
+
         # Show low stock warnings
         if low_stock_items:
             messagebox.showwarning(
@@ -465,236 +542,91 @@ class PosApp:
         self.invoice_header_var.set(f"Invoice #: {self.get_next_invoice_number()}")
         return invoice_number
 
-    def generate_pdf(self, invoice_number):
+    def record_sale_locally(self, lines, table_number, date_str):
+        """Write the sale to the database; returns (invoice_number, low_stock) or None"""
         try:
-        # 1) User home → Downloads (fallback to home)
-            user_home = os.path.expanduser("~")
-            downloads = os.path.join(user_home, "Downloads")
-            if not os.path.isdir(downloads):
-                messagebox.showwarning(
-                    "Warning",
-                    f"No Downloads folder at:\n{downloads}\n"
-                    "Saving invoices in your Home folder instead.",
-                    parent=self.window
-                )
-                downloads = user_home
-
-        # 2) Create invoices subfolder
-            invoice_dir = os.path.join(downloads, "invoices")
-            os.makedirs(invoice_dir, exist_ok=True)
-
-        # 3) Build filename (with timestamp)
-            filename = os.path.join(
-                invoice_dir,
-                f"{invoice_number}_{datetime.now():%Y%m%d_%H%M%S}.pdf"
-            )
-
-        # 4) Fetch sale header
-            conn = sqlite3.connect(DB_PATH)
-            cur  = conn.cursor()
-            cur.execute(
-                "SELECT id, date, total FROM sales WHERE invoice_number = ?",
-                (invoice_number,)
-            )
-            row = cur.fetchone()
-            if not row:
-                messagebox.showerror("Error", "Invoice not found", parent=self.window)
-                conn.close()
-                return None
-            sale_id, date_str, total = row
-
-        # 5) Fetch sale items
-            cur.execute("""
-                SELECT items.name, sale_items.quantity, sale_items.price
-                FROM sale_items
-                JOIN items ON sale_items.item_id = items.id
-                WHERE sale_id = ?
-            """, (sale_id,))
-            items = cur.fetchall()
-            conn.close()
-
-        # 6) Draw the PDF
-            c = canvas.Canvas(filename, pagesize=letter)
-            w, h = letter
-
-        # Header
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(72, h-72, "HD Super Mart")
-            c.setFont("Helvetica", 12)
-            c.drawString(72, h-90, "12505 Bel Red Road, Ste 212, Bellevue, WA 98005")
-            c.drawString(72, h-108, "(425) 389 0173")
-
-        # Invoice info
-            c.drawString(72, h-140, f"Invoice #: {invoice_number}")
-            c.drawString(72, h-155, f"Date:       {date_str}")
-            c.drawString(72, h-170, "Cashier:    Admin")
-
-        # Table header
-            y = h-220
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(72,  y,   "Item")
-            c.drawString(300, y,   "Qty")
-            c.drawString(400, y,   "Price")
-            c.drawString(500, y,   "Subtotal")
-
-        # Table rows
-            y -= 24
-            c.setFont("Helvetica", 12)
-            for name, qty, price in items:
-                subtotal = qty * price
-                c.drawString(72,  y,   name)
-                c.drawString(300, y,   str(qty))
-                c.drawString(400, y,   f"₹{price:.2f}")
-                c.drawString(500, y,   f"₹{subtotal:.2f}")
-                y -= 20
-
-        # Grand total
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(400, y-40, f"Total: ₹{total:.2f}")
-
-            c.save()
-
-        # 7) Confirmation
-            if os.path.isfile(filename):
-                messagebox.showinfo(
-                    "Invoice Saved",
-                    f"Invoice PDF saved to:\n{filename}",
-                    parent=self.window
-                )
-                return filename
-            else:
-                messagebox.showerror(
-                    "Error",
-                    f"Failed to write PDF to:\n{filename}",
-                    parent=self.window
-                )
-                return None
-
-        except Exception as e:
-            messagebox.showerror(
-                "PDF Error",
-                f"Failed to generate PDF:\n{e}",
-                parent=self.window
-            )
+            invoice_number = self.invoices.allocate()
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Failed to reserve invoice number: {str(e)}")
             return None
 
-
-    def print_pdf(self, filename):
-    
         try:
-            if not filename or not os.path.exists(filename):
-                messagebox.showerror("Print Error", "PDF file does not exist", parent=self.window)
-                return
-
-            if os.name == 'nt':
-                # Windows: shell‐print
-                try:
-                    os.startfile(filename, "print")
-                except Exception:
-                    # If direct print fails, open for manual print
-                    os.startfile(filename)
-                    messagebox.showinfo(
-                        "Print Instructions",
-                        "PDF opened—use its viewer’s Print command.",
-                        parent=self.window
-                    )
-            elif os.name == 'posix':
-            # macOS / Linux: use lp
-                subprocess.run(["lp", filename], check=False)
-            else:
-                messagebox.showwarning(
-                    "Print Error",
-                    "Printing not supported on this OS.",
-                    parent=self.window
-                )
+            # Lines, stock and journal are written in one commit, shared with
+            # any other writes queued in the same moment
+            _invoice, _sale_id, low_stock = get_writer(DB_PATH).submit(
+                record_sale, lines, table_number, invoice_number, date_str).result(WRITE_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            # The sale may still commit, so its invoice number stays taken
+            messagebox.showerror("Database Error",
+                                 f"The database did not answer within {WRITE_TIMEOUT} s; invoice "
+                                 f"{invoice_number} may still be saved. Check the ledger before "
+                                 "ringing the sale up again.")
+            return None
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            self.invoices.release(invoice_number)
+            messagebox.showerror("Database Error", f"Failed to save sale: {str(e)}")
+            return None
+        return invoice_number, low_stock
 
-        except Exception as e:
-            messagebox.showerror("Print Error", f"Failed to print PDF:\n{e}", parent=self.window)
+    def checkout_via_service(self, lines, table_number, date_str):
+        """Send the sale to the POS service, which numbers it; returns (invoice_number, low_stock) or None"""
+        from pos_service import ServiceError
+        try:
+            sale = self.service.call(
+                "checkout", table_number=table_number, date=date_str,
+                lines=[{'id': line['id'], 'qty': line['qty'], 'price': line['price']} for line in lines])
+        except (ServiceError, OSError, TimeoutError) as e:
+            messagebox.showerror("Database Error", f"Failed to save sale: {str(e)}")
+            return None
+        return sale['invoice_number'], sale['low_stock']
 
     def get_next_invoice_number(self):
-        """Get the next invoice number from settings"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM settings WHERE key = 'last_invoice_number'")
-        result = cursor.fetchone()
-        conn.close()
-        return f"HYP-{int(result[0]) + 1}" if result else "HYP-10000"
+        """Get the next invoice number this terminal will use"""
+        try:
+            if self.service:
+                return self.service.call("peek_invoice")
+            return self.invoices.peek()
+        except (sqlite3.Error, RuntimeError, OSError):
+            return "HYP-?"
 
     def print_thermal(self, invoice_number, table_number):
-        """Print receipt to thermal printer"""
-        try:
-            from escpos.printer import Usb
-            
-            # Replace with your printer's vendor/product IDs - these need configuration
-            printer = Usb(0x0416, 0x5011)  # Example IDs for Bixolon printer
-            
-            # Get sale data
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT items.name, sale_items.quantity, sale_items.price
-                FROM sale_items
-                JOIN items ON sale_items.item_id = items.id
-                JOIN sales ON sale_items.sale_id = sales.id
-                WHERE sales.invoice_number = ?
-            """, (invoice_number,))
-            items = cursor.fetchall()
-            total = sum(qty * price for _, qty, price in items)
-            conn.close()
-
-            # Create receipt content
-            printer.text("\nHD SUPER MART\n")
-            printer.text("12505 Bel Red Road\n")
-            printer.text(f"Invoice: {invoice_number}\n")
-            printer.text(f"Table: {table_number}\n")
-            printer.text(f"Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
-            printer.text("-" * 32 + "\n")
-            
-            for name, qty, price in items:
-                line = f"{name[:20]:<20} {qty:>3}x{price:>6.2f}"
-                printer.text(line + "\n")
-                
-            printer.text("-" * 32 + "\n")
-            printer.text(f"TOTAL: ₹{total:.2f}\n")
-            printer.cut()
-            
-        except ImportError:
-            # Handle case where escpos module is not installed
-            messagebox.showwarning("Print Warning", 
-                "Thermal printing requires the python-escpos module.\n"
-                "Please install it with: pip install python-escpos")
-            # Generate and open PDF as fallback
-            pdf_file = self.generate_pdf(invoice_number)
-            if pdf_file:
-                self.print_pdf(pdf_file)
-        except Exception as e:
-            messagebox.showerror("Print Error", f"Failed to print receipt: {str(e)}")
-
-    def sanitize(self, text):
-        """Sanitize text for output"""
-        replacements = {
-            '\u2009': ' ',   # Thin space
-            '\u20b9': 'Rs.', # Indian Rupee sign
-            '\u2013': '-',   # En dash
-            '\u2019': "'"    # Right single quote
-        }
-        for char, replacement in replacements.items():
-            text = text.replace(char, replacement)
-        return text.encode('ascii', 'ignore').decode('ascii')
+        """Queue the receipt on the thermal printer spooler"""
+        invoice = None
+        if self.last_sale and self.last_sale['invoice_number'] == invoice_number:
+            invoice = self.last_sale
+        get_spooler().submit(invoice_number, table_number, invoice,
+                             lambda *result: self.print_results.put(result))
+        self.status_var.set(f"Printing receipt {invoice_number}…")
+        self.print_pending += 1
+        if self.print_pending == 1:
+            self.root.after(PRINT_POLL_MS, self.poll_print_results)
+
+    def poll_print_results(self):
+        """Report spooler outcomes on the Tk thread"""
+        while True:
+            try:
+                invoice_number, outcome, detail = self.print_results.get_nowait()
+            except queue.Empty:
+                break
+            self.print_pending -= 1
+            if outcome == "printed":
+                self.status_var.set(f"Receipt {invoice_number} printed")
+            elif outcome == "pdf":
+                self.status_var.set(f"Printer unavailable, invoice {invoice_number} "
+                                    f"sent to the system printer as PDF:\n{detail}")
+            else:
+                self.status_var.set(f"Receipt {invoice_number} not printed")
+                messagebox.showerror("Print Error", f"Failed to print receipt: {detail}", parent=self.root)
+
+        if self.print_pending:
+            self.root.after(PRINT_POLL_MS, self.poll_print_results)
 
     def save_and_print(self):
         """Save the sale and print receipt"""
         invoice_number = self.save_sale()
         if invoice_number:
             table_number = self.table_entry.get() or "N/A"
-            try:
-                self.print_thermal(invoice_number, table_number)
-            except Exception as e:
-                messagebox.showerror("Print Error", f"Thermal printing failed: {str(e)}")
-                # Fallback to PDF
-                pdf_file = self.generate_pdf(invoice_number)
-                if pdf_file:
-                    self.print_pdf(pdf_file)
+            self.print_thermal(invoice_number, table_number)
 
 # Only make necessary directories
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
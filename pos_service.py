@@ -0,0 +1,417 @@
+import argparse
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import socketserver
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from catalog_index import get_catalog
+from database import BILLING_DB, close_thread_connections, fetch_one, get_connection, transaction
+from invoice_numbers import INVOICE_PREFIX, InvoiceAllocator
+from item_search import search_names, uses_trigram
+from journal import adjust_stock, get_writer
+from restock import receive_stock
+from sales import record_sale
+
+DEFAULT_PORT = 8765   # used when POS_SERVICE gives only a host
+CALL_TIMEOUT = 30     # seconds a client waits for any one reply
+SEARCH_LIMIT = 50     # search results returned at most
+
+
+def parse_address(text):
+    """'host:port', 'host' or ':port' -> (host, port)"""
+    host, _sep, port = text.rpartition(":") if ":" in text else (text, "", "")
+    return host or "127.0.0.1", int(port or DEFAULT_PORT)
+
+
+class ServiceError(RuntimeError):
+    """An operation failed on the service; the message comes from the server"""
+
+
+# --- Server ---
+
+class PosService:
+    """The operations terminals call; the only code that touches the database.
+
+    Reads are served from the process-wide catalog index and the calling
+    thread's connection. Writes go through the group commit writer, so
+    checkouts arriving together from several tills share one commit. As
+    the only writer, the service numbers each invoice inside its sale's
+    transaction, so numbers need no reserved blocks and leave no gaps.
+    """
+
+    def __init__(self, db_path=BILLING_DB):
+        from migrations import ensure_schema
+
+        self.db_path = db_path
+        self.warnings = ensure_schema(db_path)
+        self.trigram = uses_trigram(get_connection(db_path))
+        self.catalog = get_catalog(db_path)
+        self.catalog.ensure_loaded()
+        self.writer = get_writer(db_path)
+        self.ops = {
+            "ping": lambda: "pong",
+            "lookup": self.lookup,
+            "search": self.search,
+            "stock": self.stock,
+            "peek_invoice": self.peek_invoice,
+            "checkout": self.checkout,
+            "receive": self.receive,
+            "adjust": self.adjust,
+        }
+
+    def dispatch(self, op, args):
+        """Run op; returns its result, or a Future for writes still in the writer's queue"""
+        handler = self.ops.get(op)
+        if handler is None:
+            raise ServiceError(f"Unknown operation: {op}")
+        return handler(**args)
+
+    def lookup(self, term):
+        item = self.catalog.lookup(term)
+        return list(item) if item else None
+
+    def search(self, term, limit=SEARCH_LIMIT):
+        """Catalog hits first, topped up with substring matches from the FTS index"""
+        items = [list(item) for item in self.catalog.search(term, limit=limit)]
+        if len(items) < limit and any(len(w) >= 3 for w in term.split()):
+            seen = {item[0] for item in items}
+            for row in search_names(get_connection(self.db_path), term, limit, self.trigram):
+                if len(items) >= limit:
+                    break
+                if row[0] not in seen:
+                    seen.add(row[0])
+                    items.append(list(row))
+        return items
+
+    def stock(self, item_id):
+        row = fetch_one("SELECT quantity FROM items WHERE id = ?", (item_id,), db_path=self.db_path)
+        return row[0] if row else None
+
+    def peek_invoice(self):
+        """The next invoice number, for display; another till may take it first"""
+        row = fetch_one("SELECT CAST(value AS INTEGER) + 1 FROM settings WHERE key = 'last_invoice_number'",
+                        db_path=self.db_path)
+        return f"{INVOICE_PREFIX}{row[0]}"
+
+    def checkout(self, lines, table_number=None, date=None):
+        """Save a sale of [{'id', 'qty', 'price'}, ...]; the invoice number is assigned here"""
+        return self.writer.submit(checkout, lines, table_number, date)
+
+    def receive(self, lines):
+        """Restock {barcode: qty}; returns the number of new items"""
+        future = self.writer.submit(receive_stock, lines)
+
+        def done(received):
+            if received.exception() is None:
+                for barcode in lines:
+                    self.catalog.refresh_barcode(barcode)
+
+        future.add_done_callback(done)
+        return future
+
+    def adjust(self, item_id, delta, notes=None):
+        return self.writer.submit(adjust_stock, item_id, delta, notes)
+
+
+def checkout(cursor, lines, table_number=None, date=None):
+    invoice_number, sale_id, low_stock = record_sale(cursor, lines, table_number, None, date)
+    return {'invoice_number': invoice_number, 'sale_id': sale_id,
+            'low_stock': [list(row) for row in low_stock]}
+
+
+class PosRequestHandler(socketserver.StreamRequestHandler):
+    """One terminal connection: newline-delimited JSON requests, answered in order.
+
+    A line holds one request {"id", "op", "args"} or a list of them (a
+    batch), answered by one response or a list of responses. Writes in a
+    batch are all queued before any is waited on, so they share a commit.
+    """
+
+    def handle(self):
+        service = self.server.service
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.send({"id": None, "error": "Malformed request"})
+                    continue
+                requests = message if isinstance(message, list) else [message]
+                pending = []
+                for request in requests:
+                    if not isinstance(request, dict):
+                        pending.append(ValueError("Malformed request"))
+                        continue
+                    try:
+                        pending.append(service.dispatch(request.get("op"), request.get("args") or {}))
+                    except Exception as e:
+                        pending.append(e)
+                responses = [self.response(request, outcome)
+                             for request, outcome in zip(requests, pending)]
+                self.send(responses if isinstance(message, list) else responses[0])
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            close_thread_connections()
+
+    @staticmethod
+    def response(request, outcome):
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if isinstance(outcome, Exception):
+                raise outcome
+            if isinstance(outcome, concurrent.futures.Future):
+                outcome = outcome.result()
+            return {"id": request_id, "result": outcome}
+        except Exception as e:
+            return {"id": request_id, "error": str(e) or type(e).__name__}
+
+    def send(self, message):
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class PosServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, service):
+        self.service = service
+        super().__init__(address, PosRequestHandler)
+
+
+# --- Client ---
+
+class PosClient:
+    """Connection from a terminal to the service; safe to share between threads.
+
+    submit() sends a request without waiting and returns a Future, so
+    many requests can be in flight on one connection (pipelining); a
+    reader thread matches replies to them by id. batch() sends several
+    requests in one message. call() is submit() plus waiting.
+    """
+
+    def __init__(self, address, timeout=CALL_TIMEOUT):
+        self.timeout = timeout
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.closed = False
+        threading.Thread(target=self.read_replies, name="pos-client", daemon=True).start()
+
+    def _request(self, op, args):
+        future = concurrent.futures.Future()
+        request_id = next(self.ids)
+        self.pending[request_id] = future
+        return {"id": request_id, "op": op, "args": args}, future
+
+    def _send(self, message):
+        data = json.dumps(message).encode("utf-8") + b"\n"
+        with self.lock:
+            if self.closed:
+                raise ConnectionError("Service connection is closed")
+            self.sock.sendall(data)
+
+    def submit(self, op, **args):
+        with self.lock:
+            request, future = self._request(op, args)
+        self._send(request)
+        return future
+
+    def batch(self, requests):
+        """Send [(op, args), ...] as one message; returns a Future per request"""
+        with self.lock:
+            pairs = [self._request(op, args) for op, args in requests]
+        self._send([request for request, _future in pairs])
+        return [future for _request, future in pairs]
+
+    def call(self, op, **args):
+        return self.submit(op, **args).result(self.timeout)
+
+    def read_replies(self):
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                for reply in message if isinstance(message, list) else [message]:
+                    future = self.pending.pop(reply.get("id"), None)
+                    if future is None:
+                        continue
+                    if "error" in reply:
+                        future.set_exception(ServiceError(reply["error"]))
+                    else:
+                        future.set_result(reply.get("result"))
+        except (OSError, ValueError):
+            pass
+        with self.lock:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(ConnectionError("Lost connection to the POS service"))
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def client_from_env():
+    """PosClient for the address in POS_SERVICE, or None to use the database directly"""
+    address = os.environ.get("POS_SERVICE")
+    return PosClient(parse_address(address)) if address else None
+
+
+# --- Simulated terminals ---
+
+SIM_ITEMS = 2000  # items in the scratch catalog
+
+
+def _sim_terminal(db_path, address, terminal, sales, lines, ready, go, results):
+    """One till: look up a few barcodes, then check out; records per-sale latency"""
+    rng = random.Random(terminal)
+    latencies, errors = [], []
+    client = PosClient(address) if address else None
+    allocator = None if client else InvoiceAllocator(db_path, f"sim-{terminal}")
+    ready.release()
+    go.wait()
+    for _ in range(sales):
+        barcodes = [f"sim-{rng.randrange(SIM_ITEMS)}" for _ in range(lines)]
+        start = time.perf_counter()
+        try:
+            if client:
+                # All lookups in one round trip, then the checkout
+                items = [f.result(CALL_TIMEOUT) for f in
+                         client.batch([("lookup", {"term": b}) for b in barcodes])]
+                cart = [{'id': item[0], 'qty': 1, 'price': item[2]} for item in items]
+                client.call("checkout", lines=cart, table_number=terminal)
+            else:
+                cart = []
+                for barcode in barcodes:
+                    item_id, price = fetch_one("SELECT id, price FROM items WHERE barcode = ?",
+                                               (barcode,), db_path=db_path)
+                    cart.append({'id': item_id, 'qty': 1, 'price': price})
+                invoice_number = allocator.allocate()
+                with transaction(db_path) as cursor:
+                    record_sale(cursor, cart, terminal, invoice_number)
+        except (sqlite3.Error, ServiceError, ConnectionError) as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+    if client:
+        client.close()
+    else:
+        allocator.close()
+    close_thread_connections()
+    results.put((latencies, errors))
+
+
+def simulate(terminals, sales, lines=3, direct=False):
+    """Run terminals simulated tills against a scratch database, through the service or not"""
+    from migrations import migrate
+
+    folder = tempfile.mkdtemp(prefix="pos_service_sim_")
+    server = None
+    try:
+        db_path = os.path.join(folder, "billing.db")
+        migrate(db_path)
+        get_connection(db_path).execute("PRAGMA journal_mode = WAL")
+        with transaction(db_path) as cursor:
+            cursor.executemany("INSERT INTO items (barcode, name, price, quantity) VALUES (?, ?, ?, ?)",
+                               [(f"sim-{i}", f"Sim item {i}", 10.0 + i % 50, 1000000)
+                                for i in range(SIM_ITEMS)])
+        close_thread_connections()
+
+        address = None
+        if not direct:
+            server = PosServer(("127.0.0.1", 0), PosService(db_path))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            address = server.server_address
+
+        # Spawned, not forked, so tills never inherit this process's connections
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        ready, go = context.Semaphore(0), context.Event()
+        workers = [context.Process(target=_sim_terminal,
+                                   args=(db_path, address, n, sales, lines, ready, go, results))
+                   for n in range(terminals)]
+        for worker in workers:
+            worker.start()
+        # Start the clock once every till has started up and connected
+        for _ in workers:
+            ready.acquire()
+        start = time.perf_counter()
+        go.set()
+        outcomes = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(t for done, _errors in outcomes for t in done)
+        errors = [e for _done, errs in outcomes for e in errs]
+        saved = fetch_one("SELECT COUNT(*) FROM sales", db_path=db_path)[0]
+        print(f"{terminals} terminals x {sales} sales of {lines} lines, "
+              f"{'direct database' if direct else 'via service'}")
+        print(f"  saved {saved} sales in {elapsed:.2f}s ({saved / elapsed:.0f} sales/sec)")
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+            print(f"  latency per sale: median {statistics.median(latencies) * 1000:.1f} ms, "
+                  f"p95 {p95 * 1000:.1f} ms")
+        if server:
+            writer = server.service.writer
+            print(f"  commits: {writer.commits} for {writer.ops} writes")
+        print(f"  errors: {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+        return not errors and saved == terminals * sales
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+            server.service.writer.close()
+        close_thread_connections()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local catalog and sales service for several tills")
+    parser.add_argument("--db", default=BILLING_DB)
+    parser.add_argument("--address", default=os.environ.get("POS_SERVICE", f"127.0.0.1:{DEFAULT_PORT}"),
+                        help="host:port to listen on (default POS_SERVICE)")
+    parser.add_argument("--simulate", type=int, metavar="N",
+                        help="instead of serving, run N simulated tills on a scratch database")
+    parser.add_argument("--sales", type=int, default=200, help="sales per simulated till")
+    parser.add_argument("--lines", type=int, default=3, help="lines per simulated sale")
+    parser.add_argument("--direct", action="store_true",
+                        help="simulated tills open the database themselves, for comparison")
+    args = parser.parse_args()
+
+    if args.simulate:
+        ok = simulate(args.simulate, args.sales, args.lines, args.direct)
+        raise SystemExit(0 if ok else 1)
+
+    service = PosService(args.db)
+    for _warning in service.warnings:
+        print(f"Warning: {_warning}")
+    with PosServer(parse_address(args.address), service) as server:
+        print(f"Serving {args.db} on {server.server_address[0]}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,265 @@
+import argparse
+import datetime
+import os
+import queue
+import subprocess
+import threading
+import time
+
+from database import BILLING_DB, close_thread_connections
+from invoice_pdf import default_invoice_dir, load_invoice, render_invoice
+
+MAX_RETRIES = 3       # printer attempts before falling back to PDF
+RETRY_BACKOFF = 0.5   # seconds before the first retry, doubled each time
+
+# Example IDs for Bixolon printer; override with POS_PRINTER=usb:VID:PID
+USB_VENDOR_ID = 0x0416
+USB_PRODUCT_ID = 0x5011
+
+
+def format_receipt(invoice, table_number):
+    """Receipt text for an invoice dict (see invoice_pdf.load_invoice)"""
+    lines = [
+        "",
+        "HD SUPER MART",
+        "12505 Bel Red Road",
+        f"Invoice: {invoice['invoice_number']}",
+        f"Table: {table_number}",
+        f"Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        "-" * 32,
+    ]
+    for name, qty, price in invoice['lines']:
+        lines.append(f"{name[:20]:<20} {qty:>3}x{price:>6.2f}")
+    lines.append("-" * 32)
+    total = sum(qty * price for _, qty, price in invoice['lines'])
+    lines.append(f"TOTAL: ₹{total:.2f}")
+    return lines
+
+
+class EscposUsbBackend:
+    """ESC/POS USB thermal printer, connected once and kept open"""
+
+    def __init__(self, vendor_id=USB_VENDOR_ID, product_id=USB_PRODUCT_ID):
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.printer = None
+
+    def print_receipt(self, lines):
+        if self.printer is None:
+            from escpos.printer import Usb
+            self.printer = Usb(self.vendor_id, self.product_id)
+        try:
+            self.printer.text("\n".join(lines) + "\n")
+            self.printer.cut()
+        except Exception:
+            # Drop the session so the next attempt reconnects
+            self.close()
+            raise
+
+    def close(self):
+        if self.printer is not None:
+            try:
+                self.printer.close()
+            except Exception:
+                pass
+            self.printer = None
+
+
+class FileBackend:
+    """Appends receipts to a file; also works with a raw printer device path"""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def print_receipt(self, lines):
+        if self.handle is None:
+            self.handle = open(self.path, "a", encoding="utf-8")
+        self.handle.write("\n".join(lines) + "\n\n")
+        self.handle.flush()
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+class MemoryBackend:
+    """Keeps receipts in a list; for measuring throughput without hardware"""
+
+    def __init__(self):
+        self.receipts = []
+
+    def print_receipt(self, lines):
+        self.receipts.append(lines)
+
+    def close(self):
+        pass
+
+
+def make_backend(spec=None):
+    """Backend from a spec such as 'usb', 'usb:0416:5011', 'file:receipts.txt' or 'memory'.
+
+    Defaults to the POS_PRINTER environment variable, then 'usb'.
+    """
+    spec = spec or os.environ.get("POS_PRINTER") or "usb"
+    kind, _, arg = spec.partition(":")
+    if kind == "usb":
+        if arg:
+            vendor, _, product = arg.partition(":")
+            return EscposUsbBackend(int(vendor, 16), int(product, 16))
+        return EscposUsbBackend()
+    if kind == "file":
+        return FileBackend(arg or "receipts.txt")
+    if kind == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown printer backend: {spec}")
+
+
+def print_pdf_file(filename):
+    """Send a PDF to the system printer without any dialogs"""
+    if os.name == 'nt':
+        try:
+            os.startfile(filename, "print")
+        except Exception:
+            # If direct print fails, open for manual print
+            os.startfile(filename)
+    elif os.name == 'posix':
+        subprocess.run(["lp", filename], check=True, capture_output=True)
+    else:
+        raise OSError("Printing not supported on this OS")
+
+
+class PrintSpooler:
+    """Receipt print queue served by one worker thread and one printer session.
+
+    Failed jobs are retried with exponential backoff. When the printer still
+    fails, or the backend is unavailable (e.g. python-escpos missing), the
+    invoice is rendered to PDF and sent to the system printer, still on the
+    worker thread. Each job's notify callback is called on the worker thread
+    as notify(invoice_number, outcome, detail). outcome is 'printed', 'pdf'
+    (detail is the PDF path) or 'failed' (detail is the error).
+    """
+
+    def __init__(self, backend=None, db_path=BILLING_DB, max_retries=MAX_RETRIES,
+                 backoff=RETRY_BACKOFF, pdf_fallback=True):
+        self.backend = backend or make_backend()
+        self.db_path = db_path
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pdf_fallback = pdf_fallback
+        self.jobs = queue.Queue()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def submit(self, invoice_number, table_number="N/A", invoice=None, notify=None):
+        """Queue a receipt; pass invoice (as from load_invoice) to skip the DB read"""
+        self.jobs.put((invoice_number, table_number, invoice, notify))
+
+    def stop(self):
+        self.jobs.put(None)
+
+    def join(self):
+        """Wait until every queued job has been handled"""
+        self.jobs.join()
+
+    def run(self):
+        try:
+            while True:
+                job = self.jobs.get()
+                try:
+                    if job is None:
+                        break
+                    self.handle(*job)
+                finally:
+                    self.jobs.task_done()
+        finally:
+            self.backend.close()
+            close_thread_connections()
+
+    def handle(self, invoice_number, table_number, invoice, notify):
+        try:
+            if invoice is None:
+                invoice = load_invoice(invoice_number, self.db_path)
+            if invoice is None:
+                raise LookupError(f"Invoice {invoice_number} not found")
+            outcome, detail = self.print_with_retry(invoice, table_number)
+        except Exception as e:
+            outcome, detail = "failed", e
+        if notify:
+            notify(invoice_number, outcome, detail)
+
+    def print_with_retry(self, invoice, table_number):
+        lines = format_receipt(invoice, table_number)
+        delay = self.backoff
+        error = None
+        for attempt in range(self.max_retries):
+            try:
+                self.backend.print_receipt(lines)
+                return "printed", None
+            except ImportError as e:
+                # Missing driver module; retrying will not help
+                error = e
+                break
+            except Exception as e:
+                error = e
+                if attempt + 1 < self.max_retries:
+                    time.sleep(delay)
+                    delay *= 2
+
+        if not self.pdf_fallback:
+            return "failed", error
+        output_dir = default_invoice_dir()
+        os.makedirs(output_dir, exist_ok=True)
+        filename = render_invoice(invoice, os.path.join(
+            output_dir, f"{invoice['invoice_number']}_{datetime.datetime.now():%Y%m%d_%H%M%S}.pdf"))
+        print_pdf_file(filename)
+        return "pdf", filename
+
+
+_spooler = None
+_spooler_lock = threading.Lock()
+
+
+def get_spooler():
+    """Process-wide spooler, so every window shares one printer session"""
+    global _spooler
+    with _spooler_lock:
+        if _spooler is None:
+            _spooler = PrintSpooler()
+        return _spooler
+
+
+def bench(receipts, backend_spec, lines_per_receipt):
+    """Measure receipts/sec through the spooler with a stand-in backend"""
+    backend = make_backend(backend_spec)
+    spooler = PrintSpooler(backend, pdf_fallback=False)
+    invoice = {
+        'invoice_number': "HYP-BENCH",
+        'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'lines': [(f"Item {n}", 1 + n % 3, 10.0 + n) for n in range(lines_per_receipt)],
+    }
+    outcomes = {}
+
+    def notify(_invoice_number, outcome, _detail):
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    start = time.perf_counter()
+    for n in range(receipts):
+        spooler.submit(f"HYP-{n}", "1", invoice, notify)
+    spooler.join()
+    elapsed = time.perf_counter() - start
+    spooler.stop()
+    print(f"{receipts} receipts x {lines_per_receipt} lines via {backend_spec}: "
+          f"{elapsed:.3f}s ({receipts / elapsed:.0f} receipts/sec) {outcomes}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receipt print spooler tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="measure spooler throughput")
+    p_bench.add_argument("--receipts", type=int, default=1000)
+    p_bench.add_argument("--lines", type=int, default=10, help="lines per receipt")
+    p_bench.add_argument("--backend", default="memory", help="memory or file:PATH")
+    args = parser.parse_args()
+    bench(args.receipts, args.backend, args.lines)
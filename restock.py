@@ -1,10 +1,37 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import concurrent.futures
+import queue
 import sqlite3
-import cv2
-from pyzbar.pyzbar import decode
-import threading
-from datetime import datetime
+from barcode_scanner import BarcodeScanner
+from catalog_index import get_catalog
+from database import BILLING_DB, fetch_one
+from journal import WRITE_TIMEOUT, append, get_writer
+
+SCAN_TICK_MS = 100       # how often scanned codes are moved into the session
+CATALOG_RELOAD_AT = 500  # reload the whole search index after receiving more lines than this
+
+
+def receive_stock(cursor, lines):
+    """Apply a receiving session {barcode: qty} in the caller's transaction.
+
+    Unknown barcodes are created with an empty name and zero price, stock
+    is added with quantity = quantity + ? so concurrent sales are never
+    overwritten, and one Purchase journal row is written per line.
+    Returns the number of barcodes that were new.
+    """
+    lines = [(barcode, qty) for barcode, qty in lines.items() if qty > 0]
+    cursor.executemany("""
+        INSERT INTO items (barcode, name, price, quantity)
+        SELECT ?1, '', 0.0, 0
+        WHERE NOT EXISTS (SELECT 1 FROM items WHERE barcode = ?1)
+    """, [(barcode,) for barcode, _qty in lines])
+    created = cursor.rowcount  # summed over every line by executemany
+    cursor.executemany("UPDATE items SET quantity = quantity + ? WHERE barcode = ?",
+                       [(qty, barcode) for barcode, qty in lines])
+    append(cursor, "Purchase", [(barcode, qty, None) for barcode, qty in lines], by="barcode")
+    return created
+
 
 class RestockManager:
     def __init__(self, window):
@@ -12,26 +39,41 @@ class RestockManager:
         self.window.title("Restock Items")
         self.window.geometry("800x600")
         self.scanner_active = False
-        self.cap = None
+        self.scanner = None
+        self.scan_queue = queue.Queue()
+
+        # Receiving session: {barcode: qty} in scan order, applied by process_restock
+        self.lines = {}
+        self.line_names = {}
 
         self.create_widgets()
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def create_widgets(self):
         main_frame = ttk.Frame(self.window)
-        main_frame.pack(padx=30, pady=30)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=30, pady=20)
 
         # Barcode Scanner Section
         scan_frame = ttk.Frame(main_frame)
-        scan_frame.pack(pady=20)
+        scan_frame.pack(pady=10)
 
-        ttk.Button(scan_frame, text="📷 Scan Barcode", 
+        ttk.Button(scan_frame, text="📷 Scan Barcodes",
                    command=self.start_scan, padding=10).pack(side=tk.LEFT)
         self.barcode_entry = ttk.Entry(scan_frame, width=25)
         self.barcode_entry.pack(side=tk.LEFT, padx=10)
+        self.barcode_entry.bind("<Return>", lambda _event: self.add_entered_line())
+
+        ttk.Label(scan_frame, text="Qty:").pack(side=tk.LEFT)
+        self.qty_entry = ttk.Entry(scan_frame, width=6)
+        self.qty_entry.insert(0, "1")
+        self.qty_entry.pack(side=tk.LEFT, padx=5)
+        self.qty_entry.bind("<Return>", lambda _event: self.add_entered_line())
 
-        # Item Details
+        ttk.Button(scan_frame, text="Add Line", command=self.add_entered_line).pack(side=tk.LEFT, padx=5)
+
+        # Item Details of the last line added
         details_frame = ttk.Frame(main_frame)
-        details_frame.pack(pady=20)
+        details_frame.pack(pady=10)
 
         ttk.Label(details_frame, text="Item Name:").grid(row=0, column=0, sticky=tk.E)
         self.name_label = ttk.Label(details_frame, text="-")
@@ -41,132 +83,153 @@ class RestockManager:
         self.price_label = ttk.Label(details_frame, text="-")
         self.price_label.grid(row=1, column=1, sticky=tk.W)
 
-        # Restock Controls
-        ttk.Label(main_frame, text="Quantity to Add:").pack(pady=10)
-        self.qty_entry = ttk.Entry(main_frame)
-        self.qty_entry.pack()
-
-        ttk.Button(main_frame, text="Restock", 
-                   command=self.process_restock, padding=10).pack(pady=20)
+        # Session lines
+        cols = ("Barcode", "Item", "Qty")
+        self.lines_tree = ttk.Treeview(main_frame, columns=cols, show="headings", height=12)
+        for col in cols:
+            self.lines_tree.heading(col, text=col)
+            self.lines_tree.column(col, width=200 if col == "Item" else 120, anchor=tk.CENTER)
+        self.lines_tree.pack(fill=tk.BOTH, expand=True)
+
+        self.session_label = ttk.Label(main_frame, text="")
+        self.session_label.pack(pady=5)
+        self.update_session_label()
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Remove Line", command=self.remove_line).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Clear", command=self.clear_session).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Receive All",
+                   command=self.process_restock, padding=10).pack(side=tk.LEFT, padx=20)
 
     def start_scan(self):
         if self.scanner_active:
             return
         self.scanner_active = True
-        threading.Thread(target=self.scan_barcode, daemon=True).start()
+        self.scanner = BarcodeScanner(self.scan_queue.put, on_finish=self.on_scan_finished,
+                                      continuous=True,
+                                      window_title='Receiving - Press q to stop')
+        self.scanner.start()
+        self.window.after(SCAN_TICK_MS, self.drain_scan_queue)
 
-    def scan_barcode(self):
-        """Open webcam feed and scan for barcode."""
-        self.cap = cv2.VideoCapture(0)
-        barcode_data = None
-
-        while self.scanner_active:
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-            # Decode barcodes
-            for barcode in decode(frame):
-                barcode_data = barcode.data.decode('utf-8')
-                self.scanner_active = False
-                break
+    def on_scan_finished(self, codes):
+        self.scanner_active = False
 
-            # Show feed
-            cv2.imshow('Scanning - Press q to cancel', frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                barcode_data = None
-                self.scanner_active = False
+    def drain_scan_queue(self):
+        """Add every code scanned since the last tick as one unit each"""
+        while True:
+            try:
+                barcode = self.scan_queue.get_nowait()
+            except queue.Empty:
                 break
+            self.add_line(barcode, 1)
 
-        # Cleanup
-        if self.cap:
-            self.cap.release()
-        cv2.destroyAllWindows()
+        if self.scanner_active or not self.scan_queue.empty():
+            self.window.after(SCAN_TICK_MS, self.drain_scan_queue)
 
-        # Populate entry and details
-        if barcode_data:
-            self.window.after(0, self.barcode_entry.delete, 0, tk.END)
-            self.window.after(0, self.barcode_entry.insert, 0, barcode_data)
-            self.window.after(0, self.load_item_details, barcode_data)
+    def add_entered_line(self):
+        barcode = self.barcode_entry.get().strip()
+        if not barcode:
+            messagebox.showerror("Error", "Scan or enter a barcode first.", parent=self.window)
+            return
+        try:
+            qty = int(self.qty_entry.get().strip())
+        except ValueError:
+            messagebox.showerror("Error", "Quantity must be an integer.", parent=self.window)
+            return
+        if qty <= 0:
+            messagebox.showerror("Error", "Quantity must be > 0.", parent=self.window)
+            return
+        self.add_line(barcode, qty)
+        self.barcode_entry.delete(0, tk.END)
+        self.barcode_entry.focus_set()
+
+    def add_line(self, barcode, qty):
+        """Add qty to the session line for barcode; nothing is written yet"""
+        if barcode not in self.line_names:
+            self.line_names[barcode] = self.load_item_details(barcode)
+        self.lines[barcode] = self.lines.get(barcode, 0) + qty
+        values = (barcode, self.line_names[barcode], self.lines[barcode])
+        if self.lines_tree.exists(barcode):
+            self.lines_tree.item(barcode, values=values)
         else:
-            messagebox.showwarning("Scan Cancelled", "No barcode detected.", parent=self.window)
+            self.lines_tree.insert("", tk.END, iid=barcode, values=values)
+        self.lines_tree.see(barcode)
+        self.update_session_label()
 
     def load_item_details(self, barcode):
-        """Fetch existing item details from DB."""
-        conn = sqlite3.connect('db/pos.db')
-        c = conn.cursor()
-        c.execute("SELECT name, price FROM items WHERE barcode = ?", (barcode,))
-        row = c.fetchone()
-        conn.close()
+        """Fetch existing item details from DB; returns the name to list"""
+        row = fetch_one("SELECT name, price FROM items WHERE barcode = ?", (barcode,), db_path=BILLING_DB)
 
         if row:
             name, price = row
             self.name_label.config(text=name)
             self.price_label.config(text=f"₹{price:.2f}")
-        else:
-            self.name_label.config(text="<new item>")
-            self.price_label.config(text="-/-")
+            return name
+        self.name_label.config(text="<new item>")
+        self.price_label.config(text="-/-")
+        return "<new item>"
+
+    def update_session_label(self):
+        self.session_label.config(
+            text=f"{len(self.lines)} lines, {sum(self.lines.values())} units in this delivery")
+
+    def remove_line(self):
+        for barcode in self.lines_tree.selection():
+            self.lines.pop(barcode, None)
+            self.lines_tree.delete(barcode)
+        self.update_session_label()
+
+    def clear_session(self):
+        if self.lines and not messagebox.askyesno(
+                "Clear", f"Discard {len(self.lines)} unreceived lines?", parent=self.window):
+            return
+        self.lines.clear()
+        self.line_names.clear()
+        self.lines_tree.delete(*self.lines_tree.get_children())
+        self.update_session_label()
 
     def process_restock(self):
-        barcode = self.barcode_entry.get().strip()
-        qty_text = self.qty_entry.get().strip()
-        name = self.name_label.cget('text')
-        price_label = self.price_label.cget('text')
-
-        if not barcode:
+        """Receive every session line in one transaction"""
+        if not self.lines:
             messagebox.showerror("Error", "Scan a barcode first.", parent=self.window)
             return
+
         try:
-            qty = int(qty_text)
-        except ValueError:
-            messagebox.showerror("Error", "Quantity must be an integer.", parent=self.window)
+            created = get_writer(BILLING_DB).submit(receive_stock, dict(self.lines)).result(WRITE_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            messagebox.showerror("Database Error",
+                                 f"The database did not answer within {WRITE_TIMEOUT} s; the delivery may "
+                                 "still be received. Check stock before receiving it again.", parent=self.window)
             return
-        if qty <= 0:
-            messagebox.showerror("Error", "Quantity must be > 0.", parent=self.window)
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            messagebox.showerror("Database Error", f"Nothing was received: {e}", parent=self.window)
             return
 
-        conn = sqlite3.connect('db/billing.db')
-        c = conn.cursor()
-        # Determine item exists
-        c.execute("SELECT name, price, quantity FROM items WHERE barcode = ?", (barcode,))
-        row = c.fetchone()
-        if row:
-            old_name, old_price, old_qty = row
-            new_qty = old_qty + qty
-            c.execute(
-                "UPDATE items SET quantity = ?, name = ?, price = ? WHERE barcode = ?",
-                (new_qty, old_name if name == '<new item>' else name, old_price if price_label == '-/-' else float(price_label.replace('₹','')), barcode)
-            )
-            txn_type = 'Purchase'
-            item_name = old_name
-            price = old_price
+        catalog = get_catalog(BILLING_DB)
+        if len(self.lines) > CATALOG_RELOAD_AT:
+            catalog.load()
         else:
-            # New item: insert with placeholder name and price
-            new_qty = qty
-            placeholder_price = 0.0
-            c.execute(
-                "INSERT INTO items (barcode, name, price, quantity) VALUES (?, ?, ?, ?)",
-                (barcode, '', placeholder_price, new_qty)
-            )
-            txn_type = 'Purchase'
-            item_name = ''
-            price = placeholder_price
-
-        # Record in ledger table
-        txn_date = datetime.now().strftime('%Y-%m-%d')
-        try:
-            c.execute(
-                "INSERT INTO ledger (date, type, item_name, quantity, price) VALUES (?,?,?,?,?)",
-                (txn_date, txn_type, item_name, qty, price)
-            )
-        except sqlite3.Error as e:
-            messagebox.showwarning("Ledger Error", f"Failed to record ledger: {e}", parent=self.window)
-
-        conn.commit()
-        conn.close()
+            for barcode in self.lines:
+                catalog.refresh_barcode(barcode)
 
-        messagebox.showinfo("Success", f"Restocked {qty} units of '{item_name or barcode}'.", parent=self.window)
+        message = f"Received {sum(self.lines.values())} units across {len(self.lines)} items."
+        if created:
+            message += f"\n{created} new item(s) were created; set their names and prices in the Inventory Editor."
+        messagebox.showinfo("Success", message, parent=self.window)
         # Clear inputs
+        self.lines.clear()
+        self.line_names.clear()
+        self.lines_tree.delete(*self.lines_tree.get_children())
+        self.update_session_label()
         self.barcode_entry.delete(0, tk.END)
-        self.qty_entry.delete(0, tk.END)
         self.name_label.config(text="-")
         self.price_label.config(text="-")
+
+    def on_close(self):
+        if self.lines and not messagebox.askyesno(
+                "Unreceived Lines", f"Discard {len(self.lines)} unreceived lines?", parent=self.window):
+            return
+        if self.scanner_active and self.scanner:
+            self.scanner.stop()
+        self.window.destroy()
@@ -0,0 +1,69 @@
+import datetime
+
+from journal import append
+from sales_summary import add_sale
+
+LOW_STOCK_THRESHOLD = 10  # warn when an item drops below this many units
+
+
+def next_invoice_number(cursor):
+    """Bump settings.last_invoice_number and return the new invoice number"""
+    # UPDATE then SELECT rather than RETURNING, which needs SQLite 3.35
+    cursor.execute("""
+        UPDATE settings SET value = CAST(value AS INTEGER) + 1
+        WHERE key = 'last_invoice_number'
+    """)
+    cursor.execute("SELECT value FROM settings WHERE key = 'last_invoice_number'")
+    return f"HYP-{cursor.fetchone()[0]}"
+
+
+def record_sale(cursor, cart, table_number=None, invoice_number=None, date_str=None):
+    """Write a sale, its lines and the stock decrement in the caller's transaction.
+
+    cart is a list of dicts with 'id', 'qty' and 'price'. The lines go in with
+    one executemany, stock is decremented by a single set-based UPDATE driven
+    by the inserted lines, and one query finds the items now running low.
+    The daily, per-item and hourly summaries and the journal (and so the
+    ledger) are updated in the same transaction. Returns (invoice_number,
+    sale_id, low_stock) with low_stock as [(name, remaining), ...].
+    """
+    if invoice_number is None:
+        invoice_number = next_invoice_number(cursor)
+    if date_str is None:
+        date_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    total = sum(item['qty'] * item['price'] for item in cart)
+
+    # ts is written here (normalized as sales_ts_ai would) so the trigger
+    # does not need a second UPDATE per sale
+    cursor.execute("""
+        INSERT INTO sales (date, ts, total, invoice_number, table_number)
+        VALUES (:date, COALESCE(datetime(:date), :date), :total, :invoice, :table_number)
+    """, {"date": date_str, "total": total, "invoice": invoice_number, "table_number": table_number})
+    sale_id = cursor.lastrowid
+
+    cursor.executemany("""
+        INSERT INTO sale_items (sale_id, item_id, quantity, price)
+        VALUES (?, ?, ?, ?)
+    """, [(sale_id, item['id'], item['qty'], item['price']) for item in cart])
+
+    cursor.execute("""
+        UPDATE items
+        SET quantity = quantity - (
+            SELECT SUM(sale_items.quantity) FROM sale_items
+            WHERE sale_items.sale_id = :sale_id AND sale_items.item_id = items.id
+        )
+        WHERE id IN (SELECT item_id FROM sale_items WHERE sale_id = :sale_id)
+    """, {"sale_id": sale_id})
+
+    add_sale(cursor, sale_id, date_str, total)
+    append(cursor, "Sale", [(item['id'], item['qty'], item['price']) for item in cart],
+           invoice_number, date_str)
+
+    cursor.execute("""
+        SELECT name, quantity FROM items
+        WHERE id IN (SELECT item_id FROM sale_items WHERE sale_id = ?)
+          AND quantity < ?
+    """, (sale_id, LOW_STOCK_THRESHOLD))
+    low_stock = cursor.fetchall()
+
+    return invoice_number, sale_id, low_stock
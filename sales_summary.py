@@ -0,0 +1,178 @@
+import argparse
+import datetime
+import time
+
+from database import BILLING_DB, fetch_all, fetch_one, transaction
+
+
+def ensure_summary_tables(cursor):
+    """Create the per-day, per-day-per-item and per-hour sales summaries.
+
+    Newly created summaries are filled from the existing sales.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tables = {row[0] for row in cursor.fetchall()}
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            day TEXT PRIMARY KEY,
+            sales_count INTEGER NOT NULL,
+            items_sold INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_item_sales (
+            day TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (day, item_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS hourly_sales (
+            day TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            sales_count INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (day, hour)
+        ) WITHOUT ROWID
+    """)
+
+    if "daily_sales" not in tables and {"sales", "sale_items"} <= tables:
+        rebuild(cursor)
+
+
+def add_sale(cursor, sale_id, date_str, total):
+    """Fold one sale, already written by record_sale, into the summaries"""
+    cursor.execute("""
+        INSERT INTO daily_sales (day, sales_count, items_sold, revenue)
+        SELECT date(:ts), 1, COALESCE(SUM(quantity), 0), :total
+        FROM sale_items WHERE sale_id = :sale_id
+        ON CONFLICT (day) DO UPDATE SET
+            sales_count = sales_count + 1,
+            items_sold = items_sold + excluded.items_sold,
+            revenue = revenue + excluded.revenue
+    """, {"ts": date_str, "total": total, "sale_id": sale_id})
+    cursor.execute("""
+        INSERT INTO hourly_sales (day, hour, sales_count, revenue)
+        VALUES (date(:ts), CAST(strftime('%H', :ts) AS INTEGER), 1, :total)
+        ON CONFLICT (day, hour) DO UPDATE SET
+            sales_count = sales_count + 1,
+            revenue = revenue + excluded.revenue
+    """, {"ts": date_str, "total": total})
+    cursor.execute("""
+        INSERT INTO daily_item_sales (day, item_id, quantity, revenue)
+        SELECT date(:ts), item_id, SUM(quantity), SUM(quantity * price)
+        FROM sale_items WHERE sale_id = :sale_id
+        GROUP BY item_id
+        ON CONFLICT (day, item_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue
+    """, {"ts": date_str, "sale_id": sale_id})
+
+
+def rebuild(cursor):
+    """Recompute every summary from sales and sale_items"""
+    cursor.execute("DELETE FROM daily_sales")
+    cursor.execute("DELETE FROM daily_item_sales")
+    cursor.execute("DELETE FROM hourly_sales")
+    cursor.execute("""
+        INSERT INTO daily_sales (day, sales_count, items_sold, revenue)
+        SELECT date(sales.date), COUNT(*), COALESCE(SUM(lines.items), 0), SUM(sales.total)
+        FROM sales
+        LEFT JOIN (
+            SELECT sale_id, SUM(quantity) AS items FROM sale_items GROUP BY sale_id
+        ) AS lines ON lines.sale_id = sales.id
+        WHERE date(sales.date) IS NOT NULL
+        GROUP BY date(sales.date)
+    """)
+    cursor.execute("""
+        INSERT INTO hourly_sales (day, hour, sales_count, revenue)
+        SELECT date(date), CAST(strftime('%H', date) AS INTEGER), COUNT(*), SUM(total)
+        FROM sales
+        WHERE date(date) IS NOT NULL
+        GROUP BY 1, 2
+    """)
+    cursor.execute("""
+        INSERT INTO daily_item_sales (day, item_id, quantity, revenue)
+        SELECT date(sales.date), sale_items.item_id,
+               SUM(sale_items.quantity), SUM(sale_items.quantity * sale_items.price)
+        FROM sale_items
+        JOIN sales ON sales.id = sale_items.sale_id
+        WHERE date(sales.date) IS NOT NULL
+        GROUP BY 1, 2
+    """)
+
+
+# --- Reports; each reads one row per day (or hour), never raw sales ---
+
+def period_totals(from_day, to_day, db_path=BILLING_DB):
+    """(sales_count, items_sold, revenue) for an inclusive range of days"""
+    return fetch_one("""
+        SELECT COALESCE(SUM(sales_count), 0), COALESCE(SUM(items_sold), 0),
+               COALESCE(SUM(revenue), 0)
+        FROM daily_sales WHERE day BETWEEN ? AND ?
+    """, (from_day, to_day), db_path=db_path)
+
+
+def day_totals(day, db_path=BILLING_DB):
+    return period_totals(day, day, db_path)
+
+
+def month_to_date(day, db_path=BILLING_DB):
+    return period_totals(day[:8] + "01", day, db_path)
+
+
+def hourly(day, db_path=BILLING_DB):
+    """[(hour, sales_count, revenue), ...] for one day"""
+    return fetch_all("""
+        SELECT hour, sales_count, revenue FROM hourly_sales
+        WHERE day = ? ORDER BY hour
+    """, (day,), db_path=db_path)
+
+
+def daily(from_day, to_day, db_path=BILLING_DB):
+    """[(day, sales_count, items_sold, revenue), ...] for an inclusive range"""
+    return fetch_all("""
+        SELECT day, sales_count, items_sold, revenue FROM daily_sales
+        WHERE day BETWEEN ? AND ? ORDER BY day
+    """, (from_day, to_day), db_path=db_path)
+
+
+def top_items(from_day, to_day, limit=10, db_path=BILLING_DB):
+    """[(name, quantity, revenue), ...] best sellers by revenue"""
+    return fetch_all("""
+        SELECT COALESCE(items.name, '#' || totals.item_id), totals.quantity, totals.revenue
+        FROM (
+            SELECT item_id, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+            FROM daily_item_sales WHERE day BETWEEN ? AND ?
+            GROUP BY item_id
+        ) AS totals
+        LEFT JOIN items ON items.id = totals.item_id
+        ORDER BY totals.revenue DESC
+        LIMIT ?
+    """, (from_day, to_day, limit), db_path=db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily sales summary tools")
+    parser.add_argument("--db", default=BILLING_DB)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="recompute the summaries from all historical sales")
+    parser.add_argument("--day", default=datetime.date.today().isoformat(),
+                        help="day to report on (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        start = time.perf_counter()
+        with transaction(args.db) as cursor:
+            ensure_summary_tables(cursor)
+            rebuild(cursor)
+        print(f"Rebuilt sales summaries in {time.perf_counter() - start:.2f}s")
+
+    count, items, revenue = day_totals(args.day, args.db)
+    print(f"{args.day}: {count} sales, {items} items, ₹{revenue:.2f}")
+    count, items, revenue = month_to_date(args.day, args.db)
+    print(f"Month to date: {count} sales, {items} items, ₹{revenue:.2f}")
@@ -0,0 +1,171 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import cv2
+
+from barcode_scanner import CODE_COOLDOWN, CodeCooldown, decode_frame
+
+DEFAULT_FPS = 30.0   # assumed frame rate for image folders and videos without one
+DEFAULT_WIDTHS = "0,1280,960,640,480,320"   # 0 decodes at full resolution
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def iter_frames(source, fps=None):
+    """Yield (timestamp, frame) from a video file or a folder of images.
+
+    Images are read in name order and spaced 1/fps apart.
+    """
+    if os.path.isdir(source):
+        fps = fps or DEFAULT_FPS
+        paths = sorted(
+            path for path in glob.glob(os.path.join(source, "*"))
+            if path.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        for n, path in enumerate(paths):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield n / fps, frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise OSError(f"Cannot open video: {source}")
+    fps = fps or cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    try:
+        n = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield n / fps, frame
+            n += 1
+    finally:
+        cap.release()
+
+
+def parse_roi(text):
+    """'none' or 'x,y,w,h' as fractions of the frame"""
+    if text.lower() == "none":
+        return None
+    roi = tuple(float(v) for v in text.split(","))
+    if len(roi) != 4:
+        raise argparse.ArgumentTypeError("ROI must be x,y,w,h")
+    return roi
+
+
+def run_config(source, max_width, roi, grayscale, expected=None, fps=None,
+               cooldown=CODE_COOLDOWN, realtime=False):
+    """Decode every frame of source with one setting and return its metrics.
+
+    Codes are filtered through the same cooldown as continuous scanning, so
+    'duplicates' counts items that would have been added to the cart twice.
+    With realtime set, frames that would arrive while the previous decode is
+    still running are skipped, as the live scanner drops them.
+    """
+    filter_ = CodeCooldown(cooldown)
+    frames = decoded = dropped = reads = 0
+    accepted, false_reads = [], []
+    first_read = None
+    busy_until = 0.0
+    wall = cpu = 0.0
+
+    for timestamp, frame in iter_frames(source, fps):
+        frames += 1
+        if realtime and timestamp < busy_until:
+            dropped += 1
+            continue
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        results = decode_frame(frame, max_width, roi, grayscale)
+        elapsed = time.perf_counter() - start
+        cpu += time.process_time() - cpu_start
+        wall += elapsed
+        decoded += 1
+        busy_until = timestamp + elapsed
+
+        for code, _rect in results:
+            reads += 1
+            if expected is not None and code not in expected:
+                false_reads.append(code)
+                continue
+            if first_read is None:
+                first_read = timestamp + elapsed
+            if filter_.accept(code, timestamp):
+                accepted.append(code)
+
+    unique = set(accepted)
+    return {
+        'max_width': max_width or "full",
+        'roi': ",".join(f"{v:g}" for v in roi) if roi else "none",
+        'mode': "gray" if grayscale else "color",
+        'frames': frames,
+        'decoded': decoded,
+        'dropped': dropped,
+        'fps': decoded / wall if wall else 0.0,
+        'cpu_ms_per_frame': 1000 * cpu / decoded if decoded else 0.0,
+        'first_read_s': first_read,
+        'reads': reads,
+        'accepted': len(accepted),
+        'unique': len(unique),
+        'duplicates': len(accepted) - len(unique),
+        'false_reads': len(false_reads),
+        'missed': sorted(expected - unique) if expected is not None else [],
+    }
+
+
+def bench(source, widths, rois, modes, expected=None, fps=None,
+          cooldown=CODE_COOLDOWN, realtime=False):
+    """Run every width/ROI/mode combination and print one row per setting"""
+    print(f"{'width':>6} {'roi':>19} {'mode':>5} {'frames':>6} {'fps':>8} "
+          f"{'cpu ms':>7} {'first s':>7} {'reads':>6} {'added':>6} {'dup':>4} {'false':>5} {'missed':>6}")
+    results = []
+    for max_width in widths:
+        for roi in rois:
+            for mode in modes:
+                row = run_config(source, max_width, roi, mode == "gray",
+                                 expected, fps, cooldown, realtime)
+                results.append(row)
+                first = f"{row['first_read_s']:.2f}" if row['first_read_s'] is not None else "-"
+                print(f"{row['max_width']:>6} {row['roi']:>19} {row['mode']:>5} "
+                      f"{row['frames']:>6} {row['fps']:>8.1f} {row['cpu_ms_per_frame']:>7.2f} "
+                      f"{first:>7} {row['reads']:>6} {row['accepted']:>6} {row['duplicates']:>4} "
+                      f"{row['false_reads']:>5} {len(row['missed']):>6}", flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark barcode decoding on a recorded video or image folder")
+    parser.add_argument("source", help="video file or folder of frames")
+    parser.add_argument("--widths", default=DEFAULT_WIDTHS,
+                        help="comma-separated decode widths, 0 for full resolution")
+    parser.add_argument("--roi", type=parse_roi, action="append",
+                        help="crop as x,y,w,h fractions or 'none'; repeat to compare")
+    parser.add_argument("--modes", default="gray", help="comma-separated: gray,color")
+    parser.add_argument("--expected", help="file with the codes in the recording, one per line")
+    parser.add_argument("--fps", type=float, help="override the source frame rate")
+    parser.add_argument("--cooldown", type=float, default=CODE_COOLDOWN)
+    parser.add_argument("--realtime", action="store_true",
+                        help="skip frames that arrive while a decode is running")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    expected = None
+    if args.expected:
+        with open(args.expected, encoding="utf-8") as f:
+            expected = {line.strip() for line in f if line.strip()}
+
+    _results = bench(
+        args.source,
+        [int(w) for w in args.widths.split(",")],
+        args.roi or [None],
+        args.modes.split(","),
+        expected, args.fps, args.cooldown, args.realtime,
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(_results, f, indent=2)
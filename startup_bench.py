@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["cv2", "pyzbar", "PIL", "reportlab", "pandas", "openpyxl", "escpos"]
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed,
+                  "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(python=sys.executable):
+    """Seconds to import main.py in a fresh interpreter, plus heavy modules it loaded"""
+    out = subprocess.run([python, "-c", IMPORT_PROBE], cwd=HERE, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_first_window(command):
+    """Seconds from launching command to the menu window being drawn.
+
+    command must run main.py with --startup-probe (or a frozen build that
+    passes it through); needs a display.
+    """
+    env = dict(os.environ, POS_STARTUP_T0=repr(time.time()), POS_PREWARM="0")
+    out = subprocess.run(command, cwd=HERE, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    for line in out.splitlines():
+        if line.startswith("first_window "):
+            return float(line.split()[1])
+    raise RuntimeError(f"No startup probe output from {command}")
+
+
+def summarize(label, samples):
+    print(f"{label}: median {statistics.median(samples):.3f}s, "
+          f"min {min(samples):.3f}s, max {max(samples):.3f}s over {len(samples)} runs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure main.py cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--window", action="store_true",
+                        help="also measure time to first window (needs a display)")
+    parser.add_argument("--command", nargs="+",
+                        default=[sys.executable, "main.py", "--startup-probe"],
+                        help="how to launch the app, e.g. dist/main.exe --startup-probe")
+    parser.add_argument("--max-seconds", type=float,
+                        help="exit non-zero if the median import time exceeds this")
+    args = parser.parse_args()
+
+    results = [measure_import() for _ in range(args.runs)]
+    samples = [r["seconds"] for r in results]
+    summarize("import main", samples)
+    heavy = sorted({m for r in results for m in r["heavy"]})
+    print(f"heavy modules loaded at startup: {', '.join(heavy) or 'none'}")
+
+    if args.window:
+        summarize("first window", [measure_first_window(args.command) for _ in range(args.runs)])
+
+    if args.max_seconds is not None and statistics.median(samples) > args.max_seconds:
+        raise SystemExit(1)
+    if heavy:
+        raise SystemExit(1)
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from catalog_import import import_catalog, validate
+from database import close_thread_connections, fetch_all
+from migrations import migrate
+
+
+def frame(*rows):
+    return pd.DataFrame(rows, columns=["barcode", "name", "price", "quantity"], dtype=str)
+
+
+def test_validate_rejects_out_of_range_numbers():
+    valid, rejected = validate(frame(
+        ("1", "Tea", "10", "5"),
+        ("2", "Coffee", "inf", "5"),
+        ("3", "Milk", "10", "99999999999999999999"),
+        ("4", "Sugar", "10", "-inf"),
+        ("5", "Salt", "nan", "1"),
+    ))
+    assert valid == [("1", "Tea", 10.0, 5)]
+    assert rejected == [
+        (1, "price is not finite"),
+        (2, "quantity is too large"),
+        (3, "quantity is not a whole number"),
+        (4, "price is not a number"),
+    ]
+
+
+def test_validate_quantity_limit():
+    valid, rejected = validate(frame(("1", "Tea", "10", "9223372036854775807"),
+                                     ("2", "Coffee", "10", "18446744073709551615")))
+    assert valid == [("1", "Tea", 10.0, 2 ** 63 - 1)]
+    assert rejected == [(1, "quantity is too large")]
+
+
+def test_import_journals_stock_changes(tmp_path):
+    path = str(tmp_path / "billing.db")
+    migrate(path)
+    catalog = tmp_path / "catalog.csv"
+    try:
+        catalog.write_text("barcode,name,price,quantity\n1,Tea,10,5\n2,Coffee,20,0\n1,Tea,10,2\n")
+        import_catalog(str(catalog), path)
+        catalog.write_text("barcode,name,price,quantity\n1,Tea,12,4\n2,Coffee,20,3\n")
+        import_catalog(str(catalog), path, replace_quantity=True)
+        rows = fetch_all("SELECT kind, item_name, quantity, price, ref FROM journal ORDER BY id", db_path=path)
+    finally:
+        close_thread_connections()
+    assert rows == [
+        ("Purchase", "Tea", 5, 10.0, "Catalog import"),
+        ("Purchase", "Tea", 2, 10.0, "Catalog import"),
+        ("Adjustment", "Tea", -3, 12.0, "Catalog import"),
+        ("Adjustment", "Coffee", 3, 20.0, "Catalog import"),
+    ]
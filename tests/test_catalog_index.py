@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from catalog_index import CatalogIndex
+from database import close_thread_connections, transaction
+from migrations import migrate
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = str(tmp_path / "billing.db")
+    migrate(path)
+    with transaction(path) as cursor:
+        cursor.execute("INSERT INTO items (barcode, name, price, quantity) VALUES ('111', 'Green tea', 10, 5)")
+    catalog = CatalogIndex(path)
+    catalog.load()
+    yield catalog
+    close_thread_connections()
+
+
+def add_elsewhere(catalog, barcode, name):
+    """Insert an item the way another till would, behind the index's back"""
+    conn = sqlite3.connect(catalog.db_path)
+    with conn:
+        item_id = conn.execute("INSERT INTO items (barcode, name, price, quantity) VALUES (?, ?, 20, 1)",
+                               (barcode, name)).lastrowid
+    conn.close()
+    return item_id
+
+
+def test_lookup_falls_back_to_database(catalog):
+    item_id = add_elsewhere(catalog, "222", "Black coffee")
+    assert catalog.lookup("222") == (item_id, "Black coffee", 20.0)
+    assert catalog.search("black") == [(item_id, "Black coffee", 20.0)]
+
+
+def test_lookup_by_id_falls_back_to_database(catalog):
+    item_id = add_elsewhere(catalog, None, "Sugar")
+    assert catalog.lookup(str(item_id)) == (item_id, "Sugar", 20.0)
+
+
+def test_non_ascii_digits_are_not_ids(catalog):
+    assert catalog.lookup("²") is None
+    assert catalog.search("²") == []
+    assert catalog.lookup("9" * 30) is None
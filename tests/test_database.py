@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+import database
+from database import close_thread_connections, fetch_one, get_connection, transaction
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "BUSY_TIMEOUT_MS", 200)
+    path = str(tmp_path / "test.db")
+    with transaction(path) as cursor:
+        cursor.execute("CREATE TABLE t (x INTEGER)")
+    yield path
+    close_thread_connections()
+
+
+def hold_shared_lock(db_path):
+    """A second connection mid-read, so a rollback-journal COMMIT gets SQLITE_BUSY"""
+    reader = sqlite3.connect(db_path, isolation_level=None)
+    reader.execute("BEGIN")
+    reader.execute("SELECT * FROM t").fetchall()
+    return reader
+
+
+def test_failed_commit_rolls_back(db_path):
+    reader = hold_shared_lock(db_path)
+    with pytest.raises(sqlite3.OperationalError):
+        with transaction(db_path) as cursor:
+            cursor.execute("INSERT INTO t VALUES (1)")
+    assert not get_connection(db_path).in_transaction
+    reader.execute("ROLLBACK")
+    reader.close()
+
+    # The next transaction on this thread commits for real, not as a savepoint
+    with transaction(db_path) as cursor:
+        cursor.execute("INSERT INTO t VALUES (2)")
+    other = sqlite3.connect(db_path)
+    assert other.execute("SELECT x FROM t").fetchall() == [(2,)]
+    other.close()
+    assert fetch_one("SELECT COUNT(*) FROM t", db_path=db_path) == (1,)
@@ -0,0 +1,32 @@
+import pytest
+
+from database import close_thread_connections, transaction
+from invoice_pdf import DELETED_ITEM, load_invoice, load_invoices
+from migrations import migrate
+from sales import record_sale
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "billing.db")
+    migrate(path)
+    with transaction(path) as cursor:
+        cursor.execute("INSERT INTO items (barcode, name, price, quantity) VALUES ('1', 'Tea', 10, 50)")
+        cursor.execute("INSERT INTO items (barcode, name, price, quantity) VALUES ('2', 'Coffee', 20, 50)")
+        for _ in range(3):
+            record_sale(cursor, [{'id': 1, 'qty': 1, 'price': 10.0}, {'id': 2, 'qty': 2, 'price': 20.0}],
+                        date_str="2026-10-18 10:00:00")
+        cursor.execute("DELETE FROM items WHERE id = 2")
+    yield path
+    close_thread_connections()
+
+
+def test_deleted_items_stay_on_invoices(db_path):
+    lines = [("Tea", 1, 10.0), (DELETED_ITEM, 2, 20.0)]
+    assert load_invoice("HYP-10001", db_path)['lines'] == lines
+    assert [invoice['lines'] for invoice in load_invoices(db_path)] == [lines] * 3
+
+
+def test_invoice_number_range(db_path):
+    invoices = load_invoices(db_path, from_invoice="HYP-10002", to_invoice="10003")
+    assert [invoice['invoice_number'] for invoice in invoices] == ["HYP-10002", "HYP-10003"]
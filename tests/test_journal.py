@@ -0,0 +1,116 @@
+import sqlite3
+
+import pytest
+
+import database
+from database import close_thread_connections, fetch_all, fetch_one, transaction
+from journal import GroupCommitWriter, adjust_stock, append
+from migrations import migrate
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "BUSY_TIMEOUT_MS", 200)
+    path = str(tmp_path / "billing.db")
+    migrate(path)
+    with transaction(path) as cursor:
+        cursor.execute("INSERT INTO items (barcode, name, price, quantity) VALUES ('1', 'Tea', 10, 5)")
+    yield path
+    close_thread_connections()
+
+
+@pytest.fixture
+def writer(db_path):
+    writer = GroupCommitWriter(db_path, budget_ms=0)
+    yield writer
+    writer.close()
+
+
+def quantity(db_path):
+    """Stock as another process would see it, i.e. only what was committed"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT quantity FROM items WHERE id = 1").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_group_commits_and_journals(db_path, writer):
+    futures = [writer.submit(adjust_stock, 1, 1, "test") for _ in range(3)]
+    futures.append(writer.submit(adjust_stock, 99, 1))
+    assert [f.result(3) for f in futures[:3]] == [None] * 3
+    with pytest.raises(ValueError):
+        futures[3].result(3)
+    assert quantity(db_path) == 8
+    assert fetch_one("SELECT COUNT(*) FROM ledger WHERE type = 'Adjustment'", db_path=db_path) == (3,)
+
+
+def test_locked_database_fails_futures(db_path, writer):
+    other = sqlite3.connect(db_path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        future = writer.submit(adjust_stock, 1, 1)
+        with pytest.raises(sqlite3.OperationalError):
+            future.result(3)
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert writer.submit(adjust_stock, 1, 1).result(3) is None
+    assert quantity(db_path) == 6
+
+
+def test_failed_commit_is_not_reported_as_written(db_path, writer):
+    # A reader mid-transaction makes the writer's COMMIT fail with SQLITE_BUSY
+    reader = sqlite3.connect(db_path, isolation_level=None)
+    reader.execute("BEGIN")
+    reader.execute("SELECT * FROM items").fetchall()
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            writer.submit(adjust_stock, 1, 1).result(3)
+    finally:
+        reader.execute("ROLLBACK")
+        reader.close()
+
+    # The next write really commits, and the writer holds no lock afterwards
+    assert writer.submit(adjust_stock, 1, 2).result(3) is None
+    assert quantity(db_path) == 7
+    other = sqlite3.connect(db_path, timeout=0.2)
+    other.execute("UPDATE items SET name = 'Green tea' WHERE id = 1")
+    other.commit()
+    other.close()
+
+
+def test_unopenable_database_fails_futures(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    writer = GroupCommitWriter(str(blocker / "billing.db"), budget_ms=0)
+    try:
+        for _ in range(2):
+            with pytest.raises(OSError):
+                writer.submit(adjust_stock, 1, 1).result(3)
+        assert writer.thread.is_alive()
+    finally:
+        writer.close()
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_writer_fails_futures_and_refuses_work(db_path):
+    writer = GroupCommitWriter(db_path, budget_ms=0)
+
+    def broken(batch):
+        raise RuntimeError("writer bug")
+
+    writer.commit = broken
+    with pytest.raises(RuntimeError, match="writer bug"):
+        writer.submit(adjust_stock, 1, 1).result(3)
+    writer.thread.join(3)
+    assert not writer.thread.is_alive()
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.submit(adjust_stock, 1, 1)
+
+
+def test_append_by_barcode_uses_current_price(db_path):
+    with transaction(db_path) as cursor:
+        append(cursor, "Purchase", [("1", 4, None), ("missing", 2, None)], by="barcode")
+    rows = fetch_all("SELECT kind, item_id, item_name, quantity, price FROM journal", db_path=db_path)
+    assert rows == [("Purchase", 1, "Tea", 4, 10.0)]
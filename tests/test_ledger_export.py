@@ -0,0 +1,37 @@
+import pytest
+
+from database import close_thread_connections, fetch_all, transaction
+from ledger_export import fetch_ledger_page, page_key
+from migrations import migrate
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "billing.db")
+    migrate(path)
+    with transaction(path) as cursor:
+        cursor.executemany("INSERT INTO ledger (date, type, item_name, quantity, price) VALUES (?, 'Sale', 'Tea', 1, 10)",
+                           [(f"2026-10-{day:02d} 10:00:00",) for day in range(1, 11)])
+        # Rows whose ts is NULL must still be paged exactly once
+        cursor.execute("UPDATE ledger SET ts = NULL WHERE id % 3 = 0")
+    yield path
+    close_thread_connections()
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_date_sort_pages_every_row_once(db_path, descending):
+    seen, after = [], None
+    while True:
+        rows = fetch_ledger_page(sort="Date", descending=descending, after=after, limit=2, db_path=db_path)
+        if not rows:
+            break
+        seen += [row[0] for row in rows]
+        after = page_key(rows[-1])
+    assert sorted(seen) == list(range(1, 11))
+    assert len(seen) == 10
+
+
+def test_date_sort_uses_an_index(db_path):
+    plan = fetch_all("EXPLAIN QUERY PLAN SELECT id FROM ledger WHERE COALESCE(ts, '') < ? "
+                     "ORDER BY COALESCE(ts, '') DESC, id DESC", ("2026",), db_path=db_path)
+    assert any("idx_ledger_sort_date" in row[-1] for row in plan)
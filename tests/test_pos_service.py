@@ -0,0 +1,38 @@
+import json
+import socket
+import threading
+
+import pytest
+
+from database import close_thread_connections
+from pos_service import PosServer, PosService
+
+
+@pytest.fixture
+def address(tmp_path):
+    server = PosServer(("127.0.0.1", 0), PosService(str(tmp_path / "billing.db")))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+    close_thread_connections()
+
+
+def exchange(address, *lines):
+    with socket.create_connection(address, timeout=5) as sock:
+        reader = sock.makefile("rb")
+        replies = []
+        for line in lines:
+            sock.sendall(line.encode("utf-8") + b"\n")
+            replies.append(json.loads(reader.readline()))
+        return replies
+
+
+def test_non_object_requests_get_error_replies(address):
+    batch, single, after = exchange(
+        address, '[1, {"id": 7, "op": "lookup", "args": {"term": "x"}}]', '"lookup"',
+        '{"id": 8, "op": "lookup", "args": {"term": "x"}}')
+    assert batch == [{"id": None, "error": "Malformed request"}, {"id": 7, "result": None}]
+    assert single == {"id": None, "error": "Malformed request"}
+    # The connection survives a bad request
+    assert after == {"id": 8, "result": None}
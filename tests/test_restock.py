@@ -0,0 +1,25 @@
+import pytest
+
+from database import close_thread_connections, fetch_all, transaction
+from migrations import migrate
+from restock import receive_stock
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "billing.db")
+    migrate(path)
+    with transaction(path) as cursor:
+        cursor.execute("INSERT INTO items (barcode, name, price, quantity) VALUES ('1', 'Tea', 10, 5)")
+    yield path
+    close_thread_connections()
+
+
+def test_receive_stock_counts_new_items(db_path):
+    with transaction(db_path) as cursor:
+        assert receive_stock(cursor, {"1": 2, "2": 3, "3": 1}) == 2
+        assert receive_stock(cursor, {"2": 1, "4": 0}) == 0
+    assert fetch_all("SELECT barcode, quantity FROM items ORDER BY barcode", db_path=db_path) == [
+        ("1", 7), ("2", 4), ("3", 1)]
+    assert fetch_all("SELECT item_name, quantity FROM journal WHERE kind = 'Purchase' ORDER BY id",
+                     db_path=db_path) == [("Tea", 2), ("", 3), ("", 1), ("", 1)]